@@ -0,0 +1,139 @@
+"""
+Measures the latency and the throughput of the AI pipeline: fetch -> prompt build (retrieval) ->
+`GeminiModel.get_response` -> `GeminiModel.get_final_response`.
+
+Every simulated user owns a `GeminiModel` (and its conversation), and asks its questions one after
+the other; the users run at the same time. The fake model (flag 'fakeAI') is used unless `--live`
+is set, its latency, chunk timing and failures are set with the 'fake*' flags.
+
+Usage (from the project folder):
+
+>>> python bench_ai.py [--requests 200] [--concurrency 8] [--docs controlflow] [--version 3.13]
+...     [--model 1.5-flash] [--live] -fakeLatency 0.2 -fakeJitter 0.3 -fakeErrorRate 0.02
+
+Runtime flags can be passed after the benchmark arguments.
+"""
+
+import math
+import sys
+import threading
+import time
+from argparse import ArgumentParser
+
+_parser = ArgumentParser(description="AI pipeline benchmark.")
+_parser.add_argument("--requests", type=int, default=200)
+_parser.add_argument("--concurrency", type=int, default=8)
+_parser.add_argument("--docs", type=str, default="controlflow")
+_parser.add_argument("--version", type=str, default=None)
+_parser.add_argument("--model", type=str, default="1.5-flash")
+_parser.add_argument("--live", action="store_true")
+_args, _rest = _parser.parse_known_args()
+# Everything else is left to the runtime flags.
+sys.argv = [sys.argv[0], *_rest]
+if not _args.live and "-fakeAI" not in sys.argv:
+    sys.argv.append("-fakeAI")
+
+from src.env import *
+from src.ai import GeminiModel, DocIndex, ai_exc, digest_store, py_fetch
+
+QUESTIONS: StringList = [
+    "How do I define a function with default arguments?",
+    "What is the difference between a list and a tuple?",
+    "How do list comprehensions work?",
+    "How can I read a file line by line?",
+    "What does the else clause of a for loop do?",
+    "How do I handle an exception?",
+    "How do I create a class with a constructor?",
+    "What are keyword arguments?",
+]
+"""The questions of the simulated users, asked in turn."""
+STAGES: StringList = ["prompt", "model", "final", "total"]
+
+
+def percentile(values: list[float], p: float) -> float:
+    """The `p`th percentile (nearest rank) of `values`."""
+    ordered: list[float] = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def user(
+    number: int,
+    index: DocIndex,
+    timings: dict[str, list[float]],
+    errors: list[int],
+    lock: threading.Lock,
+) -> None:
+    """Asks the questions `number`, `number + concurrency`, ... of the benchmark."""
+    model = GeminiModel(_args.model)
+    for request in range(number, _args.requests, _args.concurrency):
+        question: str = QUESTIONS[request % len(QUESTIONS)]
+        start: float = time.perf_counter()
+        chunks: StringList = index.search(
+            question, flags.retrievalTopK, flags.contextTokens
+        )
+        prompt_end: float = time.perf_counter()
+        try:
+            response = model.get_response([question], "\n\n".join(chunks))
+        except ai_exc.AIRequestFailure:
+            with lock:
+                errors.append(request)
+            continue
+        model_end: float = time.perf_counter()
+        model.get_final_response(response.data)
+        end: float = time.perf_counter()
+
+        with lock:
+            timings["prompt"].append((prompt_end - start) * 1000)
+            timings["model"].append((model_end - prompt_end) * 1000)
+            timings["final"].append((end - model_end) * 1000)
+            timings["total"].append((end - start) * 1000)
+
+
+def main() -> None:
+    version: str = _args.version or max(
+        py_fetch.PY_VERSIONS, key=lambda v: tuple(map(int, v.split(".")))
+    )
+    start: float = time.perf_counter()
+    index = DocIndex(
+        py_fetch.fetch_content(_args.docs, version),
+        digests=None if flags.noDigests else digest_store,
+    )
+    fetch_ms: float = (time.perf_counter() - start) * 1000
+    print(
+        f"Python {version} '{_args.docs}': fetched and indexed in {fetch_ms:.1f}ms "
+        f"({index.stats()['chunks']} chunks)."
+    )
+
+    timings: dict[str, list[float]] = {stage: [] for stage in STAGES}
+    errors: list[int] = []
+    lock = threading.Lock()
+    users: list[threading.Thread] = [
+        threading.Thread(target=user, args=(n, index, timings, errors, lock))
+        for n in range(min(_args.concurrency, _args.requests))
+    ]
+    start = time.perf_counter()
+    for thread in users:
+        thread.start()
+    for thread in users:
+        thread.join()
+    elapsed: float = time.perf_counter() - start
+    py_fetch.close()
+
+    answered: int = len(timings["total"])
+    print(
+        f"{_args.requests} requests, {len(users)} users, {elapsed:.2f}s: "
+        f"{answered / elapsed:.1f} answers/s, {len(errors)} errors."
+    )
+    if not answered:
+        return
+    print(f"{'stage':>8} | {'p50':>9} | {'p95':>9} | {'p99':>9}")
+    for stage in STAGES:
+        values: list[float] = timings[stage]
+        print(
+            f"{stage:>8} | "
+            + " | ".join(f"{percentile(values, p):7.2f}ms" for p in (50, 95, 99))
+        )
+
+
+if __name__ == "__main__":
+    main()
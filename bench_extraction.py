@@ -0,0 +1,92 @@
+"""
+Compares the page extraction pipelines on saved documentation pages.
+
+- legacy: Readability -> `Cleaner.clean_html` -> BeautifulSoup `get_text` (three parses).
+- single: `extract_page`, one lxml tree for the cleaned HTML and the plain text.
+
+Usage (from the project folder, the pages default to the HTTP cache filled by the fetcher):
+
+>>> python bench_extraction.py [--pages .cache/http] [--rounds 5]
+
+Runtime flags can be passed after the benchmark arguments.
+"""
+
+import sys
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from pathlib import Path
+
+_parser = ArgumentParser(description="Extraction benchmark.")
+_parser.add_argument("--pages", type=str, default=None)
+_parser.add_argument("--rounds", type=int, default=5)
+_args, _rest = _parser.parse_known_args()
+# Everything else is left to the runtime flags.
+sys.argv = [sys.argv[0], *_rest]
+
+from bs4 import BeautifulSoup
+from lxml_html_clean.clean import Cleaner
+from readability import Document
+
+from src.env import *
+from src.ai.tools.extract import extract_page
+
+
+def legacy_pipeline(page: str) -> ExtractedHTML:
+    """The pipeline `PythonFetch` used before `extract_page`."""
+    doc: Document = Document(page)
+    title: str = doc.title()
+    cleaner = Cleaner(page_structure=True, safe_attrs_only=True)
+    html_content: str = cleaner.clean_html(doc.summary())
+    soup = BeautifulSoup(html_content, "html.parser")
+    return title, html_content, soup.get_text().strip().replace("\n\n", "\n")
+
+
+def measure(
+    pipeline: Callable[[str], ExtractedHTML], pages: StringList, rounds: int
+) -> tuple[float, int]:
+    """
+    @return tuple[float, int]: CPU seconds spent over every round, and the peak of traced memory (bytes).
+    """
+    start: float = time.process_time()
+    for _ in range(rounds):
+        for page in pages:
+            pipeline(page)
+    cpu: float = time.process_time() - start
+
+    # Memory is traced on a separate round, tracing slows the interpreter down.
+    tracemalloc.start()
+    for page in pages:
+        pipeline(page)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return cpu, peak
+
+
+def main() -> None:
+    folder: Path = Path(_args.pages or Path(CACHE_FOLDER) / "http")
+    pages: StringList = [
+        p.read_text(encoding="utf-8") for p in sorted(folder.glob("*.html"))
+    ]
+    if not pages:
+        print(f"No saved pages (*.html) in '{folder}'. Fetch some documents first.")
+        return
+
+    print(f"{len(pages)} pages, {_args.rounds} rounds.")
+    results: dict[str, tuple[float, int]] = {
+        "legacy": measure(legacy_pipeline, pages, _args.rounds),
+        "single": measure(extract_page, pages, _args.rounds),
+    }
+    for name, (cpu, peak) in results.items():
+        print(f"{name:>8}: {cpu:8.3f} s CPU | {peak / 1024:10.1f} KiB peak")
+
+    (old_cpu, old_peak), (new_cpu, new_peak) = results["legacy"], results["single"]
+    print(
+        f"CPU time: -{(1 - new_cpu / old_cpu) * 100:.1f}% | "
+        f"peak memory: -{(1 - new_peak / old_peak) * 100:.1f}%"
+    )
+
+
+if __name__ == "__main__":
+    main()
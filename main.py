@@ -1,10 +1,20 @@
 from src.ui.interface import Interface, ft
+from src.ai import GeminiModel, py_fetch, transcript
 from src.env import *
 from src.helpers import *
 
 
 def main() -> str:
     try:
+        if flags.buildDocBundle:
+            # Only pack the offline documentation, the UI is not started.
+            f_wrapper.init(lambda: py_fetch.build_bundle(flags.buildDocBundle))
+            return EnvStates.success.value
+        if flags.crawl:
+            # Pack every crawled page with the offline documentation, the UI is not started.
+            f_wrapper.init(lambda: py_fetch.build_bundle(flags.crawl, crawl=True))
+            return EnvStates.success.value
+
         # Start the key manager handling.
         f_wrapper.init(secrets.init)
         f_wrapper.init(secrets.get)
@@ -16,6 +26,13 @@ def main() -> str:
             # assets_dir="assets",
         )
     finally:
+        # Release the documentation cached for the models.
+        f_wrapper.init(GeminiModel.close_all)
+        # Release the pooled connections of the fetcher.
+        f_wrapper.init(py_fetch.close)
+        # Write the rest of the transcript.
+        if transcript is not None:
+            f_wrapper.init(transcript.close)
         results: str = f_wrapper.func_results
         logger.debug(
             f"Results: {results if results != '{}' else EnvStates.unknown_value}"
@@ -1,5 +1,27 @@
-__all__ = ["GeminiModel", "GEMINI_MODEL_NAMES", "ai_exc", "py_fetch"]
+__all__ = [
+    "GeminiModel",
+    "GEMINI_MODEL_NAMES",
+    "ai_exc",
+    "py_fetch",
+    "DocIndex",
+    "AIResponse",
+    "transcript",
+    "scheduler",
+    "router",
+    "usage",
+    "digest_store",
+]
 
-from .gemini import GeminiModel, GEMINI_MODEL_NAMES
+from .gemini import (
+    GeminiModel,
+    GEMINI_MODEL_NAMES,
+    router,
+    scheduler,
+    transcript,
+)
+from .response import AIResponse
 from .tools import exc as ai_exc
 from .tools.fetcher import py_fetch
+from .tools.digests import digest_store
+from .tools.usage import usage
+from .tools.retrieval import DocIndex
@@ -0,0 +1,294 @@
+import datetime
+import json
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+import google.generativeai as genai
+from google.generativeai import caching
+
+from src.env import *
+
+_CACHE_TTL = datetime.timedelta(hours=1)
+"""Lifetime of the documentation cached on the Gemini servers."""
+
+
+class FakeBackendError(Exception):
+    """A failure injected by the fake model (flag 'fakeErrorRate')."""
+
+
+class FakeResponse:
+    """The parts of `GenerateContentResponse` used by `GeminiModel`."""
+
+    def __init__(
+        self, text: str, chunk_delay: float = 0.0, prompt_tokens: int = 0
+    ) -> None:
+        """
+        @param text (str): The answer.
+        @param chunk_delay (float): Seconds to wait before every chunk (word), when iterated.
+        @param prompt_tokens (int): Tokens of the request, reported in the usage metadata.
+        """
+        self.text: str = text
+        self.__chunk_delay: float = chunk_delay
+        self.__prompt_tokens: int = prompt_tokens
+
+    def __iter__(self) -> Iterator["FakeResponse"]:
+        words: StringList = self.text.split(" ")
+        for i, word in enumerate(words):
+            if i and self.__chunk_delay:
+                time.sleep(self.__chunk_delay)
+            yield FakeResponse(word if i == len(words) - 1 else f"{word} ")
+
+    def to_dict(self) -> GenericKeyMap:
+        completion_tokens: int = (len(self.text) + 3) // 4
+        return {
+            "candidates": [
+                {"content": {"parts": [{"text": self.text}], "role": "model"}}
+            ],
+            "usage_metadata": {
+                "prompt_token_count": self.__prompt_tokens,
+                "candidates_token_count": completion_tokens,
+                "total_token_count": self.__prompt_tokens + completion_tokens,
+            },
+        }
+
+
+class FakeGenerativeModel:
+    """
+    A local stand-in of `genai.GenerativeModel`: it answers by echoing the question (or with the
+    answer of flag 'fakeResponse'), and measures the payload of every request. The documentation
+    of the session is uploaded once, as the Gemini context cache would.
+
+    Its latency, the timing of its chunks and its failures are set by the 'fake*' flags. They are
+    drawn from a generator seeded by flag 'fakeSeed', so runs are reproducible.
+    """
+
+    def __init__(self, model_name: str, context: Optional[str] = None) -> None:
+        self.model_name: str = model_name
+        self.payloads: list[int] = []
+        """Size (bytes) of every request."""
+        self.__lock = threading.Lock()
+        self.__random = random.Random(flags.fakeSeed)
+        if context is not None:
+            logger.info(
+                f"Fake backend: {len(context.encode('utf-8'))} bytes of documentation uploaded."
+            )
+
+    def generate_content(
+        self, contents: MemoryList, stream: bool = False
+    ) -> FakeResponse:
+        """
+        Raises:
+            `FakeBackendError`: If the request was picked to fail (flag 'fakeErrorRate').
+        """
+        payload: int = len(json.dumps(contents, default=str).encode("utf-8"))
+        with self.__lock:
+            self.payloads.append(payload)
+            number: int = len(self.payloads)
+            delay: float = flags.fakeLatency + self.__random.uniform(
+                0.0, flags.fakeJitter
+            )
+            failed: bool = self.__random.random() < flags.fakeErrorRate
+        logger.info(f"Fake backend: request #{number}, {payload} bytes.")
+
+        time.sleep(delay)
+        if failed:
+            raise FakeBackendError(f"Fake backend: request #{number} failed.")
+
+        question: str = next(
+            (c["parts"][0] for c in reversed(contents) if c["role"] == "user"), ""
+        )
+        answer: str = (
+            flags.fakeResponse or f"({self.model_name}) You asked: {question[-200:]}"
+        )
+        tokens: int = (payload + 3) // 4
+        if stream:
+            return FakeResponse(answer, flags.fakeChunkDelay, tokens)
+        # The whole answer is generated before it's returned.
+        time.sleep(flags.fakeChunkDelay * answer.count(" "))
+        return FakeResponse(answer, prompt_tokens=tokens)
+
+    def count_tokens(self, contents: str | MemoryList) -> GenericKeyMap:
+        return {"total_tokens": (len(json.dumps(contents, default=str)) + 3) // 4}
+
+
+class ModelBackend(ABC):
+    """
+    Interface of the backends of `GeminiModel`: they create the models it sends its requests to.
+
+    A model has the parts of `genai.GenerativeModel` used by `GeminiModel`: `generate_content`
+    (with `stream`) and `count_tokens`. See `new_backend` for the backend in use.
+    """
+
+    @abstractmethod
+    def client(self, model_name: str) -> genai.GenerativeModel | FakeGenerativeModel:
+        """
+        @param model_name (str): The technical name of the model, e.g. "gemini-1.5-flash".
+        @return genai.GenerativeModel | FakeGenerativeModel: A new model, without documentation.
+        The models shared by the whole process are kept by `clients`.
+        """
+        ...
+
+    @abstractmethod
+    def model(
+        self, model_name: str, context: Optional[str] = None
+    ) -> genai.GenerativeModel | FakeGenerativeModel:
+        """
+        @param model_name (str): The technical name of the model, e.g. "gemini-1.5-flash".
+        @param context (Optional[str]): The documentation of the session.
+        @return genai.GenerativeModel | FakeGenerativeModel: The model, bound to `context`. Without
+        `context`, the shared model of `clients`.
+        """
+        ...
+
+    @abstractmethod
+    def release(self) -> None:
+        """Frees what the last `model` call allocated, if anything."""
+        ...
+
+
+class GeminiBackend(ModelBackend):
+    """
+    Creates the Gemini models of a `GeminiModel`, with or without the documentation of the session.
+
+    The documentation is cached on the Gemini servers (context caching) when the API accepts it,
+    so the requests only carry the conversation. The API refuses small contexts (and some models);
+    the documentation is then sent as the system instruction of the model.
+    """
+
+    def __init__(self) -> None:
+        self.__cached: Optional[caching.CachedContent] = None
+        """The documentation cached by the last `model` call, if any."""
+
+    def client(self, model_name: str) -> genai.GenerativeModel:
+        clients.configure()
+        return genai.GenerativeModel(model_name=model_name)
+
+    def model(
+        self, model_name: str, context: Optional[str] = None
+    ) -> genai.GenerativeModel:
+        self.release()
+        if context is None:
+            return clients.get(model_name)
+
+        clients.configure()
+        try:
+            self.__cached = caching.CachedContent.create(
+                model=f"models/{model_name}",
+                system_instruction=context,
+                ttl=_CACHE_TTL,
+            )
+            logger.info(f"Documentation cached as '{self.__cached.name}'.")
+            return genai.GenerativeModel.from_cached_content(self.__cached)
+        except Exception as e:
+            logger.info(
+                f"The documentation can't be cached ({e}), it's sent as a system instruction."
+            )
+            return genai.GenerativeModel(
+                model_name=model_name, system_instruction=context
+            )
+
+    def release(self) -> None:
+        """Deletes the documentation cached by the last `model` call, if any."""
+        if self.__cached is None:
+            return
+        try:
+            self.__cached.delete()
+        except Exception as e:
+            logger.warning(f"Failed to delete '{self.__cached.name}': {e}")
+        self.__cached = None
+
+
+class FakeBackend(ModelBackend):
+    """Creates `FakeGenerativeModel`s, see `GeminiBackend`. No API key is needed."""
+
+    def client(self, model_name: str) -> FakeGenerativeModel:
+        return FakeGenerativeModel(model_name)
+
+    def model(
+        self, model_name: str, context: Optional[str] = None
+    ) -> FakeGenerativeModel:
+        if context is None:
+            return clients.get(model_name)
+        return FakeGenerativeModel(model_name, context)
+
+    def release(self) -> None:
+        pass
+
+
+def new_backend() -> ModelBackend:
+    """The backend of the process: the fake one if flag 'fakeAI' is set, Gemini otherwise."""
+    return FakeBackend() if flags.fakeAI else GeminiBackend()
+
+
+class ClientRegistry:
+    """
+    The model clients of the process, one per model name, shared by every `GeminiModel`.
+
+    The API key is decrypted and the API configured once, by the first client. A client can be
+    warmed up in the background (`warm_up`), so its connection is already open when the first
+    question is asked.
+    """
+
+    def __init__(self) -> None:
+        self.__lock = threading.RLock()
+        self.__configured: bool = False
+        self.__clients: dict[str, genai.GenerativeModel | FakeGenerativeModel] = {}
+        """`model name -> client`"""
+        self.__warm: set[str] = set()
+        """Models whose warm-up started."""
+
+    def configure(self) -> None:
+        """Configures the API with the key of `secrets`, unless it already was."""
+        if flags.fakeAI or self.__configured:
+            return
+        with self.__lock:
+            if not self.__configured:
+                genai.configure(api_key=secrets.get(decrypt=True)["GEMINI"])
+                self.__configured = True
+                logger.debug("Gemini API configured.")
+
+    def get(self, model_name: str) -> genai.GenerativeModel | FakeGenerativeModel:
+        """
+        @param model_name (str): The technical name of the model, e.g. "gemini-1.5-flash".
+        @return genai.GenerativeModel | FakeGenerativeModel: The client of `model_name`, created
+        on the first call. The fake one answers locally (flag 'fakeAI').
+        """
+        with self.__lock:
+            if model_name not in self.__clients:
+                self.__clients[model_name] = new_backend().client(model_name)
+                logger.debug(f"Client of '{model_name}' created.")
+            return self.__clients[model_name]
+
+    def warm_up(self, model_name: str) -> None:
+        """
+        Creates the client of `model_name` and opens its connection in the background, with a
+        token count (free of charge). Only the first call per model does anything.
+        """
+        with self.__lock:
+            if model_name in self.__warm:
+                return
+            self.__warm.add(model_name)
+        threading.Thread(
+            target=self.__warm_up,
+            args=(model_name,),
+            name=f"WarmUp-{model_name}",
+            daemon=True,
+        ).start()
+
+    def __warm_up(self, model_name: str) -> None:
+        start: float = time.perf_counter()
+        try:
+            self.get(model_name).count_tokens("Hello")
+        except Exception as e:
+            # The first question will open the connection (or report the problem) instead.
+            logger.warning(f"Failed to warm up '{model_name}': {e}")
+            return
+        logger.info(
+            f"'{model_name}' warmed up in {(time.perf_counter() - start) * 1000:.2f}ms."
+        )
+
+
+clients = ClientRegistry()
+"""The model clients of the process."""
@@ -1,8 +1,25 @@
-import json
+import asyncio
+import functools
+import hashlib
+import threading
+import time
+import weakref
+from collections.abc import AsyncIterator, Iterator
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import google.generativeai as genai
-from icecream import ic
+from google.api_core.exceptions import ResourceExhausted
 
+from .backends import FakeGenerativeModel, ModelBackend, clients, new_backend
+from .response import AIResponse
+from .tools.answer_cache import AnswerCache
+from .tools.history import ChatHistory, payload_bytes, prompt_tokens
+from .tools.images import ImageStore
+from .tools.journal import TranscriptJournal
+from .tools.retrieval import estimate_tokens
+from .tools.router import ModelRouter, low_confidence
+from .tools.scheduler import RequestScheduler
+from .tools.usage import usage
 from .tools.exc import *
 from src.env import *
 
@@ -12,9 +29,58 @@ def _modelname_desc(model: LitStr, desc: LitStr) -> StringMap:
     return {"MODELNAME": model, "DESCRIPTION": desc}
 
 
-GEMINI_MODEL_NAMES: StringList = ["1.5-flash", "1.5-flash-8b", "1.5-pro"]
+GEMINI_MODEL_NAMES: StringList = ["1.5-flash", "1.5-flash-8b", "1.5-pro", "auto"]
 """List of model names."""
 
+answer_cache = AnswerCache(
+    Path(globales.CACHE_FOLDER) / "answers", flags.answerCacheTTL, flags.answerCacheSize
+)
+"""Answers shared by every model instance, see `GeminiModel.ask`."""
+transcript: Optional[TranscriptJournal] = (
+    TranscriptJournal(Path(globales.CACHE_FOLDER) / "transcript.jsonl")
+    if flags.transcript
+    else None
+)
+"""Every answer, appended in the background (flag 'transcript')."""
+_FREE_TIER_QUOTAS: dict[str, tuple[int, int]] = {
+    "gemini-1.5-flash": (15, 1_000_000),
+    "gemini-1.5-flash-8b": (15, 1_000_000),
+    "gemini-1.5-pro": (2, 32_000),
+}
+"""Requests and tokens per minute of the free tier of the Gemini API, see flag 'aiFreeTier'."""
+
+
+def _quotas(model_name: str) -> tuple[int, int]:
+    """
+    Requests and tokens per minute of `model_name`, see flags 'aiRPM' and 'aiTPM'. `0` is no limit,
+    unless flag 'aiFreeTier' is set: the free tier quota of the model is used instead.
+    """
+    rpm, tpm = _FREE_TIER_QUOTAS.get(model_name, (0, 0)) if flags.aiFreeTier else (0, 0)
+    return flags.aiRPM or rpm, flags.aiTPM or tpm
+
+
+images = ImageStore(
+    Path(globales.CACHE_FOLDER) / "images",
+    flags.imageMaxSide,
+    flags.imageFormat,
+    flags.imageQuality,
+)
+"""Prepares the images of the requests, once per image."""
+router = ModelRouter(["gemini-1.5-flash-8b", "gemini-1.5-flash", "gemini-1.5-pro"])
+"""Picks the model of every request of the "auto" models, cheapest first."""
+scheduler = RequestScheduler(flags.aiWorkers, _quotas)
+"""Admits the requests of every model instance: fair between users, within the quotas."""
+_executor = ThreadPoolExecutor(
+    max_workers=flags.aiWorkers * 8, thread_name_prefix="GeminiModel"
+)
+"""
+Runs the requests of the async API. It has more threads than `aiWorkers`, so the waiting requests
+reach the queues of `scheduler`, which admits them fairly.
+"""
+_END_OF_STREAM = object()
+_open_models: "weakref.WeakSet[GeminiModel]" = weakref.WeakSet()
+"""Every `GeminiModel` of the process, see `GeminiModel.close_all`."""
+
 
 class GeminiModel:
     """
@@ -22,7 +88,27 @@ class GeminiModel:
     send prompts and receive responses.
     """
 
-    def __init__(self, model: Optional[str] = None, do_raise: bool = True) -> None:
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        do_raise: bool = True,
+        user: Optional[str] = None,
+    ) -> None:
+        # The session is set first, so `close` works even if the model doesn't initialize.
+        self.__lock = threading.Lock()
+        self.__session_text: Optional[str] = None
+        """The documentation of the session, see `set_context`."""
+        self.__sessions: dict[
+            str, tuple[ModelBackend, genai.GenerativeModel | FakeGenerativeModel]
+        ] = {}
+        """
+        `model name -> (backend, model)` of the models bound to the documentation of the session.
+        The backends create the models, the fake one answers locally (flag 'fakeAI').
+        """
+        self.__session_context: Optional[str] = None
+        """Identifier of the documentation the model was created with, see `set_context`."""
+        _open_models.add(self)
+
         # If `model` is invalid, raise an exception if needed.
         if model is None or model not in GEMINI_MODEL_NAMES:
             m: str = (
@@ -34,7 +120,7 @@ class GeminiModel:
             return
 
         # If `secrets` was not initialized, raise exception.
-        if not secrets.was_initialized():
+        if not flags.fakeAI and not secrets.was_initialized():
             raise ImpossibleKeyRetrieval(
                 f"Module '{secrets.__name__}' was not correctly initialized."
             )
@@ -52,6 +138,10 @@ class GeminiModel:
                 model="gemini-1.5-pro",
                 desc="A powerful model for intricate reasoning and complex tasks.",
             ),
+            GEMINI_MODEL_NAMES[3]: _modelname_desc(
+                model="auto",
+                desc="Picks the cheapest adequate model for every question, see `router`.",
+            ),
         }
         """
         A nested dictionary mapping friendly model names to detailed information. 
@@ -70,19 +160,372 @@ class GeminiModel:
             raise FriendlyNameIsInvalid(f"Friendly name: '{model}' is invalid.")
         self.model_name: str = self.selected_model["MODELNAME"]
         self.description: str = self.selected_model["DESCRIPTION"]
+        self.user: str = user or f"{id(self):x}"
+        """Identifies the user of the model in the request queues, see `scheduler`."""
 
-        # If `secrets` was initialized and models is not `None`, start the API.
-        genai.configure(api_key=secrets.get(decrypt=True)["GEMINI"])
-        self.__gemini = genai.GenerativeModel(
-            model_name=self.selected_model["MODELNAME"],
+        self.__auto: bool = self.model_name == "auto"
+        """Whether every request is routed to a model, see `router`."""
+        # The clients are shared, and their connection opened in the background.
+        for model_name in router.models if self.__auto else [self.model_name]:
+            clients.warm_up(model_name)
+        self.__gemini_history = ChatHistory(
+            flags.historyTokens, not flags.noHistorySummary
         )
-        self.__gemini_history: MemoryList = []
+        """The conversation, sent within a token budget."""
+        self.last_latency: dict[str, float] = {}
+        """
+        Timings (ms) of the last answer from the model (cached answers are not measured):
+        - "first_token": Until the first chunk of text arrived.
+        - "total": Until the whole answer arrived.
+        """
+        self.last_response: Optional[AIResponse] = None
+        """The last answer, streamed answers included."""
 
         logger.debug(
             f"Gemini model selected: {self.model_name}. API should be working now."
         )
 
-    def get_response(self, request: MediaList) -> Path:
+    def set_context(self, context: str, context_id: Optional[str] = None) -> bool:
+        """
+        Sets the documentation of the session: it's sent to the model once (cached, or as the
+        system instruction), and the questions only carry themselves. The model is only rebuilt
+        when the documentation changes.
+
+        @param context (str): The documentation.
+        @param context_id (Optional[str]): Identifies the documentation. Defaults to its hash.
+        @return bool: Whether the model was rebuilt.
+        """
+        friendly.i_was_called(self.set_context)
+        context_id = context_id or hashlib.sha256(context.encode("utf-8")).hexdigest()
+        if context_id == self.__session_context:
+            return False
+
+        logger.info(f"New documentation for the session: {context_id}.")
+        self.close()
+        with self.__lock:
+            self.__session_text = context
+        self.__session_context = context_id
+        if not self.__auto:
+            self.__model(self.model_name)
+        return True
+
+    def close(self) -> None:
+        """
+        Releases the models bound to the documentation of the session (e.g., the cached contents of
+        Gemini). Call this once the model is replaced or no longer used.
+        """
+        friendly.i_was_called(self.close)
+        with self.__lock:
+            for backend, _ in self.__sessions.values():
+                backend.release()
+            self.__sessions.clear()
+            self.__session_text = None
+        self.__session_context = None
+
+    @staticmethod
+    def close_all() -> None:
+        """Closes every `GeminiModel` of the process. Call this once the application shuts down."""
+        for model in list(_open_models):
+            model.close()
+
+    def ask(
+        self,
+        question: str,
+        context: Optional[str] = None,
+        context_id: Optional[str] = None,
+        use_cache: bool = True,
+    ) -> AIResponse:
+        """
+        Asks `question` about the documentation `context`, going through the answer cache.
+
+        @param question (str): The question of the user.
+        @param context (Optional[str]): The documentation the answer must follow. Leave it out to
+        use the documentation of the session (see `set_context`).
+        @param context_id (Optional[str]): Identifies the documentation in the answer cache, along
+        with `context` and the conversation so far.
+        @param use_cache (bool): If `False`, the model is always asked (the answer is still cached).
+        @return AIResponse: The answer.
+
+        Raises:
+            `AIRequestFailure`: If the Gemini API didn't answer.
+        """
+        friendly.i_was_called(self.ask)
+        context_id = self.__context_id(context, context_id)
+        cached: Optional[GenericKeyMap] = self.__cached(
+            question, context, context_id, use_cache
+        )
+        if cached is not None:
+            return self.__respond(question, cached, cached=True)
+
+        start: float = time.perf_counter()
+        data, model_name = self.__request([question], context)
+        latency: dict[str, float] = self.__measure(
+            model_name, start, time.perf_counter()
+        )
+        answer_cache.put(self.model_name, context_id, question, data)
+        return self.__respond(question, data, latency, model_name=model_name)
+
+    def ask_stream(
+        self,
+        question: str,
+        context: Optional[str] = None,
+        context_id: Optional[str] = None,
+        use_cache: bool = True,
+    ) -> Iterator[str]:
+        """
+        Same as `ask`, but yields the text of the answer while it's being generated.
+        A cached answer is yielded at once. The complete answer is still cached, and kept in
+        `last_response`.
+
+        Raises:
+            `AIRequestFailure`: If the Gemini API didn't answer, or the stream broke.
+        """
+        friendly.i_was_called(self.ask_stream)
+        context_id = self.__context_id(context, context_id)
+        cached: Optional[GenericKeyMap] = self.__cached(
+            question, context, context_id, use_cache
+        )
+        if cached is not None:
+            yield self.__respond(question, cached, cached=True).text
+            return
+
+        turn: int = self.__gemini_history.add_user(question, context)
+        start: float = time.perf_counter()
+        first_token: Optional[float] = None
+        answer: StringList = []
+        contents: MemoryList = self.__gemini_history.build(turn)
+        models: StringList = self.__route([question], context)
+        # A failed model escalates to the next one, until the first chunk was yielded.
+        for i, model_name in enumerate(models):
+            sent: float = time.perf_counter()
+            try:
+                with scheduler.slot(self.user, model_name, prompt_tokens(contents)):
+                    sent = time.perf_counter()
+                    response = self.__model(model_name).generate_content(
+                        contents, stream=True
+                    )
+                    for chunk in response:
+                        if first_token is None:
+                            first_token = time.perf_counter()
+                        answer.append(chunk.text)
+                        yield chunk.text
+                break
+            except GeneratorExit:
+                # The caller stopped reading, the answer is incomplete.
+                self.__gemini_history.drop(turn)
+                raise
+            except Exception as e:
+                logger.error(e)
+                self.__failed(model_name, e, contents, sent)
+                if answer or i == len(models) - 1:
+                    self.__gemini_history.drop(turn)
+                    raise AIRequestFailure(
+                        f"Failed to stream data from the Gemini API: {e}"
+                    )
+                router.escalate(model_name, f"request failed ({e})")
+        scheduler.charge(model_name, estimate_tokens("".join(answer)))
+        self.__gemini_history.add_model("".join(answer), turn)
+        latency: dict[str, float] = self.__measure(
+            model_name, start, time.perf_counter(), first_token
+        )
+        data: GenericKeyMap = response.to_dict()
+        self.__account(model_name, contents, data, sent)
+        if self.__auto and (reason := low_confidence(data)) is not None:
+            # The answer was already shown, it can't be escalated anymore.
+            logger.info(f"Streamed answer of {model_name} not escalated: {reason}.")
+        answer_cache.put(self.model_name, context_id, question, data)
+        self.__respond(question, data, latency, model_name=model_name)
+
+    async def ask_async(
+        self,
+        question: str,
+        context: Optional[str] = None,
+        context_id: Optional[str] = None,
+        use_cache: bool = True,
+        timeout: Optional[float] = None,
+    ) -> AIResponse:
+        """
+        Async version of `ask`. The request runs in a bounded thread pool (flag 'aiWorkers'), so
+        the event loop is never blocked.
+
+        @param timeout (Optional[float]): Seconds to wait for the answer, `None` waits forever.
+
+        Raises:
+            `AIRequestFailure`: If the Gemini API didn't answer.
+            `asyncio.TimeoutError`: If `timeout` expired.
+            `asyncio.CancelledError`: If the task was cancelled. The request itself can't be
+            interrupted; its answer is discarded (but still cached).
+        """
+        friendly.i_was_called(self.ask_async)
+        return await self.__run_async(
+            functools.partial(self.ask, question, context, context_id, use_cache),
+            timeout,
+        )
+
+    async def ask_stream_async(
+        self,
+        question: str,
+        context: Optional[str] = None,
+        context_id: Optional[str] = None,
+        use_cache: bool = True,
+    ) -> AsyncIterator[str]:
+        """
+        Async version of `ask_stream`. Cancelling the task (or closing the iterator) stops reading
+        the stream at the next chunk.
+        """
+        friendly.i_was_called(self.ask_stream_async)
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue[object] = asyncio.Queue()
+        stop: threading.Event = threading.Event()
+
+        def produce() -> None:
+            try:
+                for chunk in self.ask_stream(question, context, context_id, use_cache):
+                    if stop.is_set():
+                        return
+                    loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+            except Exception as e:
+                loop.call_soon_threadsafe(chunks.put_nowait, e)
+            loop.call_soon_threadsafe(chunks.put_nowait, _END_OF_STREAM)
+
+        loop.run_in_executor(_executor, produce)
+        try:
+            while (item := await chunks.get()) is not _END_OF_STREAM:
+                if isinstance(item, Exception):
+                    raise item
+                yield item  # type: ignore[reportReturnType]
+        finally:
+            stop.set()
+
+    async def get_response_async(
+        self,
+        request: MediaList,
+        context: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> AIResponse:
+        """Async version of `get_response`, see `ask_async`."""
+        friendly.i_was_called(self.get_response_async)
+        return await self.__run_async(
+            functools.partial(self.get_response, request, context), timeout
+        )
+
+    async def __run_async(
+        self, call: Callable[[], AIResponse], timeout: Optional[float]
+    ) -> AIResponse:
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(loop.run_in_executor(_executor, call), timeout)
+
+    def __model(self, model_name: str) -> genai.GenerativeModel | FakeGenerativeModel:
+        """
+        The model `model_name` bound to the documentation of the session (created on first use),
+        or its shared client if there's no documentation.
+        """
+        with self.__lock:
+            if self.__session_text is None:
+                return clients.get(model_name)
+            if model_name not in self.__sessions:
+                backend: ModelBackend = new_backend()
+                self.__sessions[model_name] = (
+                    backend,
+                    backend.model(model_name, self.__session_text),
+                )
+            return self.__sessions[model_name][1]
+
+    def __route(self, request: MediaList, context: Optional[str]) -> StringList:
+        """
+        The models to try for `request`, in order: the selected one, or the route of `router`.
+        Without `context`, the request is routed by the documentation of the session.
+        """
+        if not self.__auto:
+            return [self.model_name]
+        return router.route(
+            str(request[0]),
+            self.__session_text if context is None else context,
+            request[1:],
+        )
+
+    def __account(
+        self,
+        model_name: str,
+        contents: MemoryList,
+        data: Optional[GenericKeyMap],
+        sent: float,
+    ) -> None:
+        """
+        Records the request of `contents` to `model_name`, sent at `sent`, and its answer `data`
+        (`None` if it failed) in `usage` and `router`.
+        """
+        latency_ms: float = (time.perf_counter() - sent) * 1000
+        router.record(model_name, None if data is None else latency_ms)
+        answer: str = "" if data is None else self.get_final_response(data)
+        usage.record(
+            self.user,
+            model_name,
+            None if data is None else data.get("usage_metadata") or {},
+            payload_bytes(contents),
+            latency_ms,
+            (prompt_tokens(contents), estimate_tokens(answer)),
+        )
+
+    def __failed(
+        self, model_name: str, e: Exception, contents: MemoryList, sent: float
+    ) -> None:
+        self.__account(model_name, contents, None, sent)
+        if isinstance(e, ResourceExhausted):
+            scheduler.exhausted(model_name)
+
+    def __context_id(self, context: Optional[str], context_id: Optional[str]) -> str:
+        """
+        The answer cache identifier of the next question: its documentation (`context_id`, or the
+        documentation of the session), the documentation actually sent with it (`context`), and
+        the conversation before it. A follow-up question never hits the answer of another
+        conversation.
+        """
+        document: str = context_id or self.__session_context or ""
+        return hashlib.sha256(
+            f"{document}\0{context or ''}\0{self.__gemini_history.fingerprint()}".encode(
+                "utf-8"
+            )
+        ).hexdigest()
+
+    def __cached(
+        self, question: str, context: Optional[str], context_id: str, use_cache: bool
+    ) -> Optional[GenericKeyMap]:
+        """Looks `question` up in the answer cache. A hit is added to the history."""
+        cached: Optional[GenericKeyMap] = None
+        if use_cache and not flags.noAnswerCache:
+            cached = answer_cache.get(self.model_name, context_id, question)
+        else:
+            answer_cache.bypassed()
+        logger.debug(f"Answer cache: {answer_cache.stats()}")
+
+        if cached is not None:
+            turn: int = self.__gemini_history.add_user(question, context)
+            self.__gemini_history.add_model(self.get_final_response(cached), turn)
+        return cached
+
+    def __measure(
+        self,
+        model_name: str,
+        start: float,
+        end: float,
+        first_token: Optional[float] = None,
+    ) -> dict[str, float]:
+        """Returns the timings of an answer of `model_name`, and keeps them in `last_latency`."""
+        latency: dict[str, float] = {
+            "first_token": ((first_token or end) - start) * 1000,
+            "total": (end - start) * 1000,
+        }
+        self.last_latency = latency
+        logger.info(
+            f"{model_name}: first token after {latency['first_token']:.0f}ms, "
+            f"answer completed after {latency['total']:.0f}ms."
+        )
+        return latency
+
+    def get_response(
+        self, request: MediaList, context: Optional[str] = None
+    ) -> AIResponse:
         """
         this function does not handle the image, handling the image must be managed outside this scope.
         format:
@@ -90,8 +533,23 @@ class GeminiModel:
             analyze image request: `["...", ImageFile]`
             any: raise `InvalidAIRequestFormat`
         if somehow request has an error `data` will be `None`, and this will raise `AIRequestFailure`
+        `context` is the documentation the request is about, if any (see `ask`).
         """
         friendly.i_was_called(self.get_response)
+        start: float = time.perf_counter()
+        data, model_name = self.__request(request, context)
+        latency: dict[str, float] = self.__measure(
+            model_name, start, time.perf_counter()
+        )
+        return self.__respond(str(request[0]), data, latency, model_name=model_name)
+
+    def __request(
+        self, request: MediaList, context: Optional[str] = None
+    ) -> tuple[GenericKeyMap, str]:
+        """
+        Sends `request` (about the documentation `context`) to the model, see `get_response`.
+        Returns the response, and the name of the model that answered.
+        """
 
         data: NullableContentResponse = None
 
@@ -99,20 +557,26 @@ class GeminiModel:
         if self.__req_is_str(request):
             logger.info("Request only has a string.")
             # The first (0) index of `request` is always a string.
-            self.__add_history("user", request[0])
-            data = self.__handle_response()
+            turn: int = self.__gemini_history.add_user(request[0], context)  # type: ignore[reportArgumentType]
+            data, model_name = self.__handle_response(
+                turn, self.__route(request, context)
+            )
 
         elif self.__req_is_str_n_image(request):
             logger.info("The `request` object contains an image to analyze.")
             # The second (1) index of `request` is always an `ImageFile` object.
-            self.__add_history("user", request)
-            data = self.__handle_response()
+            # It's downsized and re-encoded, the history only keeps a reference to it.
+            turn = self.__gemini_history.add_user(
+                request[0], context, [images.prepare(request[1])]  # type: ignore[reportArgumentType]
+            )
+            data, model_name = self.__handle_response(
+                turn, self.__route(request, context)
+            )
 
         else:
             raise InvalidAIRequestFormat("The format of `request` is invalid.")
 
         # Check the if the `data` is valid.
-        ic(data)
         if data is None:
             raise AIRequestFailure(
                 "Failed to retrieve data from the Gemini API. "
@@ -120,23 +584,36 @@ class GeminiModel:
                 "Check the logger for more information."
             )
 
-        # Write the JSON response into a file in the local cache location.
-        latest_res: Path = Path(globales.CACHE_FOLDER) / "latest_response.json"
-        json_res: str = json.dumps(data.to_dict(), indent=1)
-        latest_res.write_text(json_res)
+        return data.to_dict(), model_name
 
-        return latest_res
+    def __respond(
+        self,
+        question: str,
+        data: GenericKeyMap,
+        latency: Optional[dict[str, float]] = None,
+        cached: bool = False,
+        model_name: Optional[str] = None,
+    ) -> AIResponse:
+        """
+        Wraps the API response `data` (of `model_name`, defaults to the selected model) and appends
+        it to the transcript, if enabled.
+        """
+        response = AIResponse(
+            text=self.get_final_response(data),
+            model=model_name or self.model_name,
+            question=question,
+            cached=cached,
+            latency=latency,
+            data=data,
+        )
+        self.last_response = response
+        if transcript is not None:
+            transcript.write(response.record())
+        return response
 
     def get_final_response(self, data: GenericKeyMap) -> str:
         return data["candidates"][0]["content"]["parts"][0]["text"]
 
-    def __add_history(self, role: str, content: object) -> GenericKeyMap:
-        """Adds a message to the chat history."""
-        friendly.i_was_called(self.__add_history)
-        history_entry: GenericKeyMap = {"role": role, "parts": content}
-        self.__gemini_history.append(history_entry)
-        return history_entry
-
     def __req_is_str(self, request: MediaList, index: int = 1) -> bool:
         """
         Checks if the request contains only a single string.
@@ -160,15 +637,43 @@ class GeminiModel:
             request[0] = "Can you please analyze this image for me?"
         return self.__req_is_str(request, 2) and isinstance(request[1], ImageFile)
 
-    def __handle_response(self) -> NullableContentResponse:
+    def __handle_response(
+        self, turn: int, models: StringList
+    ) -> tuple[NullableContentResponse, str]:
+        """
+        Asks the question `turn` to the first of `models`. A failed or low-confidence answer
+        escalates to the next one; the last answer received is kept if they all fall short.
+        """
         friendly.i_was_called(self.__handle_response)
-        logger.debug(self.__gemini_history)
+        contents: MemoryList = self.__gemini_history.build(turn)
 
-        try:
-            response = self.__gemini.generate_content(self.__gemini_history)
-            self.__add_history("gemini", response.candidates[0].content)
-        except Exception as e:
-            logger.error(e)
-            return None
+        response: NullableContentResponse = None
+        answered_by: str = models[-1]
+        for i, model_name in enumerate(models):
+            sent: float = time.perf_counter()
+            try:
+                with scheduler.slot(self.user, model_name, prompt_tokens(contents)):
+                    sent = time.perf_counter()
+                    answer = self.__model(model_name).generate_content(contents)
+                scheduler.charge(model_name, estimate_tokens(answer.text))
+            except Exception as e:
+                logger.error(e)
+                self.__failed(model_name, e, contents, sent)
+                if i < len(models) - 1:
+                    router.escalate(model_name, f"request failed ({e})")
+                continue
+            data: GenericKeyMap = answer.to_dict()
+            self.__account(model_name, contents, data, sent)
+            response, answered_by = answer, model_name
+            if i == len(models) - 1:
+                break
+            reason: Optional[str] = low_confidence(data)
+            if reason is None:
+                break
+            router.escalate(model_name, reason)
 
-        return response
+        if response is None:
+            self.__gemini_history.drop(turn)
+        else:
+            self.__gemini_history.add_model(response.text, turn)
+        return response, answered_by
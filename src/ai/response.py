@@ -0,0 +1,44 @@
+from src.env import *
+
+
+class AIResponse:
+    """An answer of the model, kept in memory."""
+
+    __slots__ = ("text", "model", "question", "cached", "latency", "data")
+
+    def __init__(
+        self,
+        text: str,
+        model: str,
+        question: str,
+        cached: bool = False,
+        latency: Optional[dict[str, float]] = None,
+        data: Optional[GenericKeyMap] = None,
+    ) -> None:
+        """
+        @param text (str): The text of the answer.
+        @param model (str): The technical name of the model that answered.
+        @param question (str): The question that was answered.
+        @param cached (bool): Whether the answer came from the answer cache.
+        @param latency (Optional[dict[str, float]]): See `GeminiModel.last_latency`.
+        @param data (Optional[GenericKeyMap]): The complete response of the API, as a dictionary.
+        """
+        self.text: str = text
+        self.model: str = model
+        self.question: str = question
+        self.cached: bool = cached
+        self.latency: dict[str, float] = latency or {}
+        self.data: GenericKeyMap = data or {}
+
+    def __repr__(self) -> str:
+        return f"AIResponse(model={self.model!r}, cached={self.cached}, text={self.text[:40]!r})"
+
+    def record(self) -> GenericKeyMap:
+        """A transcript record of the answer (without the complete API response)."""
+        return {
+            "model": self.model,
+            "question": self.question,
+            "answer": self.text,
+            "cached": self.cached,
+            "latency": self.latency,
+        }
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from pathlib import Path
+
+from .atomic import write_atomic
+from src.env import *
+
+_WORD = re.compile(r"\w+")
+_STOPWORDS: frozenset[str] = frozenset(
+    "a an and are be can could do does for how i in is it me of on or please should "
+    "the there this to what when where which why with would you".split()
+)
+"""Words that don't change the meaning of a question, they are ignored by the fingerprints."""
+_MAX_DISTANCE: int = 4
+"""Maximum Hamming distance between the fingerprints of two near-duplicate questions."""
+_MIN_SIMILARITY: float = 0.8
+"""Minimum Jaccard similarity of the trigrams of two near-duplicate questions."""
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase words of `question`, without punctuation and stopwords."""
+    words: StringList = _WORD.findall(question.lower())
+    return " ".join(w for w in words if w not in _STOPWORDS) or " ".join(words)
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i : i + 3] for i in range(max(1, len(text) - 2))}
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash of the character trigrams of `text`. Similar texts get close fingerprints."""
+    weights: list[int] = [0] * 64
+    for feature in _trigrams(text):
+        h: int = int.from_bytes(
+            hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big"
+        )
+        for bit in range(64):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def _similarity(a: str, b: str) -> float:
+    """Jaccard similarity of the trigrams of `a` and `b`."""
+    x, y = _trigrams(a), _trigrams(b)
+    return len(x & y) / len(x | y)
+
+
+class AnswerCache:
+    """
+    An on-disk cache of AI answers, keyed by the model, the documentation context and the question.
+
+    Questions are normalized first, so "How do I sort a list?" and "how to sort a list" share an
+    entry. A question that doesn't match exactly can still hit the answer of a near-duplicate
+    question (same model and context, close SimHash fingerprints and trigrams).
+
+    Entries expire after `ttl` seconds; beyond `max_entries`, the least recently used ones are
+    evicted.
+    """
+
+    def __init__(self, folder: str | Path, ttl: int, max_entries: int) -> None:
+        """
+        @param folder (str | Path): The folder of the cache.
+        @param ttl (int): Lifetime of an answer, in seconds.
+        @param max_entries (int): Maximum number of cached answers.
+        """
+        self.__folder: Path = Path(folder)
+        self.__index_path: Path = self.__folder / "index.json"
+        self.__ttl: int = ttl
+        self.__max_entries: int = max_entries
+        self.__lock = threading.Lock()
+        self.__entries: dict[str, GenericKeyMap] = self.__load_index()
+        """`key -> {"model", "context", "question", "simhash", "created", "atime"}`"""
+        self.__counters: dict[str, int] = {
+            "hits": 0,
+            "near_hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+        }
+        """
+        - "hits": Answered by an entry of the same normalized question.
+        - "near_hits": Answered by an entry of a near-duplicate question.
+        - "misses": Not cached, the model was asked.
+        - "bypassed": The cache was skipped on purpose.
+        """
+
+    def get(self, model: str, context: str, question: str) -> Optional[GenericKeyMap]:
+        """
+        Returns the cached response for `question`, or `None` on a miss.
+
+        @param model (str): The name of the model.
+        @param context (str): Hash (or any identifier) of the documentation context, and of the
+        conversation the question follows.
+        @param question (str): The question of the user.
+        """
+        normalized: str = normalize_question(question)
+        with self.__lock:
+            self.__expire()
+            key: Optional[str] = self.__key(model, context, normalized)
+            counter: str = "hits"
+            if key not in self.__entries:
+                key, counter = self.__nearest(model, context, normalized), "near_hits"
+            if key is None:
+                self.__counters["misses"] += 1
+                return None
+            try:
+                response: GenericKeyMap = json.loads(
+                    self.__entry_path(key).read_text(encoding="utf-8")
+                )
+            except (OSError, ValueError):
+                del self.__entries[key]
+                self.__counters["misses"] += 1
+                return None
+            self.__entries[key]["atime"] = time.time()
+            self.__counters[counter] += 1
+            logger.info(f"Answer cache {counter[:-1].replace('_', ' ')}: '{question}'.")
+            return response
+
+    def put(
+        self, model: str, context: str, question: str, response: GenericKeyMap
+    ) -> None:
+        """Caches `response` as the answer of `question`, evicting old entries if needed."""
+        normalized: str = normalize_question(question)
+        key: str = self.__key(model, context, normalized)
+        with self.__lock:
+            write_atomic(self.__entry_path(key), json.dumps(response))
+            now: float = time.time()
+            self.__entries[key] = {
+                "model": model,
+                "context": context,
+                "question": normalized,
+                "simhash": simhash(normalized),
+                "created": now,
+                "atime": now,
+            }
+            for old in sorted(self.__entries, key=lambda k: self.__entries[k]["atime"])[
+                : max(0, len(self.__entries) - self.__max_entries)
+            ]:
+                self.__remove(old)
+            write_atomic(self.__index_path, json.dumps(self.__entries))
+
+    def bypassed(self) -> None:
+        """Counts a request that skipped the cache."""
+        with self.__lock:
+            self.__counters["bypassed"] += 1
+
+    def stats(self) -> dict[str, float]:
+        """Returns a copy of the counters, the number of entries and the hit rate."""
+        with self.__lock:
+            stats: dict[str, float] = dict(self.__counters)
+            lookups: int = stats["hits"] + stats["near_hits"] + stats["misses"]
+            stats["entries"] = len(self.__entries)
+            stats["hit_rate"] = (
+                (stats["hits"] + stats["near_hits"]) / lookups if lookups else 0.0
+            )
+            return stats
+
+    def __key(self, model: str, context: str, normalized: str) -> str:
+        return hashlib.sha256(
+            f"{model}\0{context}\0{normalized}".encode("utf-8")
+        ).hexdigest()
+
+    def __nearest(self, model: str, context: str, normalized: str) -> Optional[str]:
+        """
+        The entry of the closest near-duplicate question, if any. Fingerprints select the
+        candidates, and their trigrams confirm them, so short questions that differ by one
+        meaningful word (e.g. "list" and "dict") don't match.
+        """
+        fingerprint: int = simhash(normalized)
+        best: Optional[str] = None
+        best_distance: int = _MAX_DISTANCE + 1
+        for key, entry in self.__entries.items():
+            if entry["model"] != model or entry["context"] != context:
+                continue
+            distance: int = (entry["simhash"] ^ fingerprint).bit_count()
+            if (
+                distance < best_distance
+                and _similarity(entry["question"], normalized) >= _MIN_SIMILARITY
+            ):
+                best, best_distance = key, distance
+        return best
+
+    def __expire(self) -> None:
+        now: float = time.time()
+        for key in [
+            k for k, e in self.__entries.items() if now - e["created"] > self.__ttl
+        ]:
+            self.__remove(key)
+
+    def __remove(self, key: str) -> None:
+        del self.__entries[key]
+        self.__entry_path(key).unlink(missing_ok=True)
+
+    def __entry_path(self, key: str) -> Path:
+        return self.__folder / f"{key}.json"
+
+    def __load_index(self) -> dict[str, GenericKeyMap]:
+        try:
+            return json.loads(self.__index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
@@ -0,0 +1,27 @@
+import os
+import threading
+from pathlib import Path
+
+
+def temp_path(path: str | Path) -> Path:
+    """
+    A temporary name next to `path`, unique per thread, to write a file before moving it into place
+    with `os.replace`. The folder of `path` is created if needed.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+
+
+def write_atomic(path: str | Path, data: str | bytes) -> int:
+    """
+    Writes `data` (text is encoded as UTF-8) into a temporary file first, then moves it over `path`,
+    so readers never see a partially written file.
+
+    @return int: The number of bytes written.
+    """
+    tmp: Path = temp_path(path)
+    raw: bytes = data.encode("utf-8") if isinstance(data, str) else data
+    tmp.write_bytes(raw)
+    os.replace(tmp, path)
+    return len(raw)
@@ -0,0 +1,78 @@
+import threading
+import time
+
+from src.env import *
+
+
+class CircuitBreaker:
+    """
+    Tracks the health of an upstream service.
+
+    - "closed": Requests flow normally. After `threshold` consecutive failures, the circuit opens.
+    - "open": Requests fail fast (no network) until `cooldown` seconds have passed.
+    - "half-open": One trial request is let through; its success closes the circuit, and its
+      failure opens it again.
+    """
+
+    def __init__(self, name: str, threshold: int, cooldown: float) -> None:
+        """
+        @param name (str): The name of the upstream, used for logging.
+        @param threshold (int): Consecutive failures needed to open the circuit.
+        @param cooldown (float): Seconds the circuit stays open before a trial request.
+        """
+        self.__name: str = name
+        self.__threshold: int = threshold
+        self.__cooldown: float = cooldown
+        self.__lock = threading.Lock()
+        self.__failures: int = 0
+        self.__opened_at: Optional[float] = None
+        """When the circuit was opened, `None` while it's closed."""
+        self.__trial: Optional[float] = None
+        """When the trial request of the half-open state was let through, `None` if there is none."""
+
+    @property
+    def state(self) -> str:
+        with self.__lock:
+            return self.__state()
+
+    def allow(self) -> bool:
+        """Whether a request may be sent right now."""
+        with self.__lock:
+            state: str = self.__state()
+            if state == "closed":
+                return True
+            # A trial that never reported back (e.g. it crashed) is replaced after a cooldown.
+            now: float = time.monotonic()
+            if state == "half-open" and (
+                self.__trial is None or now - self.__trial >= self.__cooldown
+            ):
+                self.__trial = now
+                logger.info(f"Circuit '{self.__name}' is half-open, sending a trial.")
+                return True
+            return False
+
+    def success(self) -> None:
+        with self.__lock:
+            if self.__opened_at is not None:
+                logger.info(f"Circuit '{self.__name}' is closed again.")
+            self.__failures = 0
+            self.__opened_at = None
+            self.__trial = None
+
+    def failure(self) -> None:
+        with self.__lock:
+            self.__failures += 1
+            if self.__trial is not None or self.__failures >= self.__threshold:
+                logger.warning(
+                    f"Circuit '{self.__name}' is open for {self.__cooldown}s "
+                    f"after {self.__failures} failures."
+                )
+                self.__opened_at = time.monotonic()
+                self.__trial = None
+
+    def __state(self) -> str:
+        if self.__opened_at is None:
+            return "closed"
+        if time.monotonic() - self.__opened_at >= self.__cooldown:
+            return "half-open"
+        return "open"
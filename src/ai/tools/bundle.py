@@ -0,0 +1,132 @@
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import BinaryIO
+
+from .exc import *
+from .atomic import temp_path
+from src.env import *
+
+_MAGIC: bytes = b"ZYRDOCS\0"
+_FORMAT_VERSION: int = 1
+_HEADER = struct.Struct("<8sIQQ")
+"""Magic, format version, index offset and index length."""
+
+
+class DocBundleWriter:
+    """
+    Packs cleaned documentation pages into one bundle file.
+
+    Layout:
+    - Header (`_HEADER`): magic, format version, offset and length of the index.
+    - Payload: every page (cleaned HTML and plain text) as UTF-8, one after another.
+    - Index: JSON map of `version -> page -> {"title", "html", "text"}`, where "html" and "text"
+      are `[offset, length]` pairs into the payload.
+
+    The file is written under a temporary name and only replaces `path` once it's complete.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.__path: Path = Path(path)
+        self.__tmp: Path = temp_path(self.__path)
+        self.__file: BinaryIO = open(self.__tmp, "wb")
+        self.__file.write(_HEADER.pack(_MAGIC, _FORMAT_VERSION, 0, 0))
+        self.__index: dict[str, GenericKeyMap] = {}
+
+    def add(self, version: str, page: str, title: str, html: str, text: str) -> None:
+        """Appends a page to the bundle."""
+        self.__index.setdefault(version, {})[page] = {
+            "title": title,
+            "html": self.__append(html),
+            "text": self.__append(text),
+        }
+
+    def close(self) -> Path:
+        """Writes the index, patches the header and moves the bundle into place."""
+        index: bytes = json.dumps({"versions": self.__index}).encode("utf-8")
+        offset: int = self.__file.tell()
+        self.__file.write(index)
+        self.__file.seek(0)
+        self.__file.write(_HEADER.pack(_MAGIC, _FORMAT_VERSION, offset, len(index)))
+        self.__file.close()
+        os.replace(self.__tmp, self.__path)
+        logger.info(f"Documentation bundle written to '{self.__path}'.")
+        return self.__path
+
+    def __append(self, s: str) -> list[int]:
+        data: bytes = s.encode("utf-8")
+        offset: int = self.__file.tell()
+        self.__file.write(data)
+        return [offset, len(data)]
+
+
+class DocBundle:
+    """
+    Read-only view over a bundle written by `DocBundleWriter`.
+
+    The file is memory-mapped, only the header and the index are read when opening it.
+    Pages are decoded straight from the mapping, so loading one page never reads the others.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        """
+        Raises:
+            `DocumentBundleIsInvalid`: If the file is not a (complete) documentation bundle.
+        """
+        self.path: Path = Path(path)
+        if self.path.stat().st_size < _HEADER.size:
+            raise DocumentBundleIsInvalid(
+                f"'{self.path}' is too short to be a documentation bundle."
+            )
+        with open(self.path, "rb") as f:
+            self.__mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            magic, version, offset, length = _HEADER.unpack_from(self.__mm, 0)
+            if magic != _MAGIC or version != _FORMAT_VERSION:
+                raise DocumentBundleIsInvalid(
+                    f"'{self.path}' is not a documentation bundle (version {_FORMAT_VERSION})."
+                )
+            if offset + length > len(self.__mm):
+                raise DocumentBundleIsInvalid(
+                    f"The index of '{self.path}' is truncated."
+                )
+            self.__index: dict[str, GenericKeyMap] = json.loads(
+                self.__decode([offset, length])
+            )["versions"]
+            """`version -> page -> {"title", "html", "text"}`"""
+        except (ValueError, struct.error, KeyError, TypeError) as e:
+            self.__mm.close()
+            raise DocumentBundleIsInvalid(
+                f"The index of '{self.path}' is invalid: {e}"
+            ) from e
+        except DocumentBundleIsInvalid:
+            self.__mm.close()
+            raise
+
+    @property
+    def versions(self) -> StringList:
+        return sorted(self.__index.keys())
+
+    def has(self, version: str, page: str) -> bool:
+        return page in self.__index.get(version, {})
+
+    def title(self, version: str, page: str) -> str:
+        return self.__index[version][page]["title"]
+
+    def html(self, version: str, page: str) -> str:
+        return self.__decode(self.__index[version][page]["html"])
+
+    def text(self, version: str, page: str) -> str:
+        return self.__decode(self.__index[version][page]["text"])
+
+    def close(self) -> None:
+        self.__mm.close()
+
+    def __decode(self, span: list[int]) -> str:
+        """Decodes a slice of the mapping without copying it into an intermediate `bytes`."""
+        offset, length = span
+        with memoryview(self.__mm) as mv, mv[offset : offset + length] as view:
+            return str(view, "utf-8")
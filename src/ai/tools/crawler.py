@@ -0,0 +1,153 @@
+import hashlib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urldefrag, urlsplit
+from lxml import html as lxml_html
+
+from .atomic import write_atomic
+from src.env import *
+
+
+def _normalize(url: str) -> str:
+    """Drops the fragment and the query of `url`. Folders point to their `index.html`."""
+    url = urldefrag(url)[0].split("?", 1)[0]
+    return f"{url}index.html" if url.endswith("/") else url
+
+
+class DocCrawler:
+    """
+    Crawls a documentation site breadth-first, starting from a root URL.
+
+    Only same-site links under the root are followed; every URL is visited once. Downloads to the
+    same host are capped by `host_concurrency`, while the processing of the pages overlaps them.
+
+    Recrawls are incremental: a manifest keeps the hash and the links of every visited page, so an
+    unchanged page (served by the HTTP cache, or confirmed by a `304` answer) is neither parsed for
+    links nor processed again.
+    """
+
+    def __init__(
+        self,
+        download: Callable[[str], str],
+        process: Callable[[str, str], tuple[ExtractedHTML, Path]],
+        host_concurrency: int,
+        workers: int,
+    ) -> None:
+        """
+        @param download (Callable[[str], str]): Downloads a URL, returns the raw page.
+        @param process (Callable[[str, str], tuple[ExtractedHTML, Path]]): Processes the raw page of a
+        URL: its title, cleaned HTML and plain text, and where they are stored.
+        @param host_concurrency (int): Maximum downloads running at the same time, per host.
+        @param workers (int): Maximum pages being downloaded or processed at the same time.
+        """
+        self.__download: Callable[[str], str] = download
+        self.__process: Callable[[str, str], tuple[ExtractedHTML, Path]] = process
+        self.__host_concurrency: int = host_concurrency
+        self.__workers: int = workers
+        self.__lock = threading.Lock()
+        self.__hosts: dict[str, threading.Semaphore] = {}
+        """Download slots of every host."""
+
+    def crawl(
+        self, root: str, manifest_path: str | Path, max_depth: int, max_pages: int
+    ) -> dict[str, tuple[ExtractedHTML, Path]]:
+        """
+        @param root (str): The URL the crawl starts from, e.g. "https://docs.python.org/3.13/".
+        @param manifest_path (str | Path): JSON file of the crawl manifest of `root`.
+        @param max_depth (int): Maximum number of links followed from `root`.
+        @param max_pages (int): Maximum number of visited pages.
+        @return dict[str, tuple[ExtractedHTML, Path]]: The processed pages, by URL, in crawl order.
+        """
+        friendly.i_was_called(self.crawl)
+
+        manifest: dict[str, GenericKeyMap] = self.__load_manifest(Path(manifest_path))
+        counters: dict[str, int] = {"processed": 0, "unchanged": 0, "failed": 0}
+        root = _normalize(root)
+        scope: str = root.rsplit("/", 1)[0] + "/"
+        seen: set[str] = {root}
+        frontier: StringList = [root]
+        results: dict[str, tuple[ExtractedHTML, Path]] = {}
+
+        with ThreadPoolExecutor(
+            max_workers=self.__workers, thread_name_prefix="DocCrawler"
+        ) as pool:
+            depth: int = 0
+            while frontier and len(results) < max_pages:
+                level: StringList = frontier[: max_pages - len(results)]
+                logger.info(f"Crawling {len(level)} pages at depth {depth}.")
+                frontier = []
+                visits = pool.map(lambda u: self.__visit(u, manifest, counters), level)
+                for url, visit in zip(level, visits):
+                    if visit is None:
+                        continue
+                    results[url], links = visit
+                    if depth >= max_depth:
+                        continue
+                    for link in links:
+                        if link.startswith(scope) and link not in seen:
+                            seen.add(link)
+                            frontier.append(link)
+                depth += 1
+
+        self.__save_manifest(Path(manifest_path), manifest)
+        logger.info(f"Crawl of '{root}' done: {len(results)} pages, {counters}.")
+        return results
+
+    def __visit(
+        self, url: str, manifest: dict[str, GenericKeyMap], counters: dict[str, int]
+    ) -> Optional[tuple[tuple[ExtractedHTML, Path], StringList]]:
+        """Downloads and processes one page. Returns `None` if it failed."""
+        try:
+            with self.__host_slot(url):
+                page: str = self.__download(url)
+
+            digest: str = hashlib.sha256(page.encode("utf-8")).hexdigest()
+            with self.__lock:
+                known: Optional[GenericKeyMap] = manifest.get(url, None)
+            if known is not None and known["hash"] == digest:
+                with self.__lock:
+                    counters["unchanged"] += 1
+                return self.__process(url, page), known["links"]
+
+            links: StringList = self.__links(url, page)
+            processed: tuple[ExtractedHTML, Path] = self.__process(url, page)
+            with self.__lock:
+                manifest[url] = {"hash": digest, "links": links}
+                counters["processed"] += 1
+            return processed, links
+        except Exception as e:
+            logger.warning(f"Skipping '{url}': {e}")
+            with self.__lock:
+                counters["failed"] += 1
+            return None
+
+    def __host_slot(self, url: str) -> threading.Semaphore:
+        host: str = urlsplit(url).netloc
+        with self.__lock:
+            if host not in self.__hosts:
+                self.__hosts[host] = threading.Semaphore(self.__host_concurrency)
+            return self.__hosts[host]
+
+    def __links(self, url: str, page: str) -> StringList:
+        """Every (absolute, normalized) HTML link of `page`, without duplicates."""
+        tree = lxml_html.document_fromstring(page)
+        tree.make_links_absolute(url, resolve_base_href=True)
+        links: dict[str, None] = {}
+        for element, attribute, link, _ in tree.iterlinks():
+            if element.tag != "a" or attribute != "href":
+                continue
+            link = _normalize(link)
+            if link.endswith(".html"):
+                links[link] = None
+        return list(links)
+
+    def __load_manifest(self, path: Path) -> dict[str, GenericKeyMap]:
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def __save_manifest(self, path: Path, manifest: dict[str, GenericKeyMap]) -> None:
+        write_atomic(path, json.dumps(manifest))
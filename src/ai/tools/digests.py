@@ -0,0 +1,105 @@
+import hashlib
+import json
+import re
+import threading
+from pathlib import Path
+
+from .atomic import write_atomic
+from .retrieval import HEADING
+from src.env import *
+
+_FORMAT: int = 1
+"""Version of `summarize`: digests of another version are computed again."""
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+_SENTENCE_END = re.compile(r"[.!?:]$")
+_CODE = (">>>", "...")
+_DIGEST_LINE: int = 200
+"""Maximum characters kept of a paragraph."""
+_CODE_LINES: int = 2
+"""Maximum lines kept of an example."""
+
+
+def summarize(chunk: str) -> str:
+    """
+    A compact (extractive) digest of a documentation chunk: its section titles, the first sentence
+    of every paragraph, and the first lines of every example, without their output.
+    """
+    lines: StringList = []
+    in_code: bool = False
+    code_lines: int = 0
+    for line in chunk.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if HEADING.match(line):
+            lines.append(line)
+            in_code = False
+            continue
+        if line.startswith(_CODE):
+            if not in_code:
+                in_code, code_lines = True, 0
+            if code_lines < _CODE_LINES:
+                lines.append(line)
+                code_lines += 1
+            continue
+        if in_code and not _SENTENCE_END.search(line):
+            # The output of the example.
+            continue
+        in_code = False
+        sentence: str = _SENTENCE.split(line, 1)[0]
+        if len(sentence) > _DIGEST_LINE:
+            sentence = f"{sentence[:_DIGEST_LINE].rsplit(' ', 1)[0]}..."
+        lines.append(sentence)
+    return "\n".join(lines)
+
+
+class DigestStore:
+    """
+    On-disk cache of the digests of the chunks of every page, keyed by the hash of the page text
+    (and of the chunking), so the digests of a page are only computed again when it changes.
+    """
+
+    def __init__(self, folder: str | Path) -> None:
+        self.__folder: Path = Path(folder)
+        self.__lock = threading.Lock()
+        self.__counters: dict[str, int] = {"hits": 0, "computed": 0}
+
+    def digests(
+        self, text: str, chunks: StringList, max_chunk_tokens: int
+    ) -> StringList:
+        """
+        @param text (str): The plain text of a page.
+        @param chunks (StringList): The chunks of `text`, see `DocIndex`.
+        @param max_chunk_tokens (int): The chunk size `chunks` were split with.
+        @return StringList: The digest of every chunk, cached or computed.
+        """
+        key: str = hashlib.sha256(
+            f"{_FORMAT}\0{max_chunk_tokens}\0{text}".encode("utf-8")
+        ).hexdigest()
+        path: Path = self.__folder / f"{key}.json"
+        try:
+            cached: StringList = json.loads(path.read_text(encoding="utf-8"))
+            if len(cached) == len(chunks):
+                with self.__lock:
+                    self.__counters["hits"] += 1
+                return cached
+        except (OSError, ValueError):
+            pass
+
+        digests: StringList = [summarize(chunk) for chunk in chunks]
+        write_atomic(path, json.dumps(digests))
+        with self.__lock:
+            self.__counters["computed"] += 1
+        return digests
+
+    def stats(self) -> dict[str, int]:
+        """
+        - "hits": Pages whose digests were cached.
+        - "computed": Pages whose digests were computed.
+        """
+        with self.__lock:
+            return dict(self.__counters)
+
+
+digest_store = DigestStore(Path(CACHE_FOLDER) / "digests")
+"""The digests of every fetched page."""
@@ -39,3 +39,8 @@ class DocumentModeIsInvalid(BaseException):
 class UnresolvedErrorWhileFetching(BaseException):
     def __init__(self, s: object) -> None:
         super().__init__(s, self.__class__)
+
+
+class DocumentBundleIsInvalid(BaseException):
+    def __init__(self, s: object) -> None:
+        super().__init__(s, self.__class__)
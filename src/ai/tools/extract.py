@@ -0,0 +1,52 @@
+from lxml import html as lxml_html
+from lxml.html import HtmlElement
+from lxml_html_clean.clean import Cleaner
+from readability import Document
+
+from src.env import *
+
+_CLEANER = Cleaner(page_structure=True, safe_attrs_only=True)
+"""Shared cleaner, we don't want trash! It's stateless, so every call can reuse it."""
+_MAIN_CONTENT: LitStr = (
+    "//div[@role='main']"
+    " | //div[contains(concat(' ', normalize-space(@class), ' '), ' body ')]"
+)
+"""The main content of a Sphinx page (docs.python.org)."""
+_PERMALINKS: LitStr = (
+    ".//a[contains(concat(' ', normalize-space(@class), ' '), ' headerlink ')]"
+)
+"""Sphinx permalinks ("¶") next to every heading."""
+
+
+def _main_content(tree: HtmlElement) -> Optional[HtmlElement]:
+    found: list[HtmlElement] = tree.xpath(_MAIN_CONTENT)
+    return found[0] if found else None
+
+
+def extract_page(page: str) -> ExtractedHTML:
+    """
+    Processes a downloaded documentation page.
+
+    The page is parsed once into an lxml tree; the main content is cleaned in place, and both the
+    cleaned HTML and the plain text are produced from that same tree. Pages without a Sphinx main
+    content block go through Readability first (one extra parse).
+
+    @param page (str): The raw HTML of the page.
+    @return ExtractedHTML: The page title, the cleaned HTML and the plain text.
+    """
+    tree: HtmlElement = lxml_html.document_fromstring(page)
+    title: str = (tree.findtext(".//title") or "").strip()
+
+    main: Optional[HtmlElement] = _main_content(tree)
+    if main is None:
+        # Simplified "reader mode" HTML
+        logger.debug(f"'{title}' has no main content block, using Readability.")
+        main = lxml_html.fromstring(Document(page).summary())
+
+    for permalink in main.xpath(_PERMALINKS):
+        permalink.drop_tree()
+    _CLEANER(main)
+    html_content: str = lxml_html.tostring(main, encoding="unicode")
+    html_raw_text: str = main.text_content().strip().replace("\n\n", "\n")
+
+    return title, html_content, html_raw_text
@@ -1,14 +1,29 @@
-from bs4 import BeautifulSoup
+import asyncio
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from icecream import ic
 import requests
 from requests import Session, Response
+from requests.adapters import HTTPAdapter
+from requests import exceptions as req_exc
 from requests.exceptions import RequestException
-from readability import Document
-from lxml_html_clean.clean import Cleaner
-from tenacity import retry, stop_after_attempt, wait_fixed
+from tenacity import (
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)
 
 from .exc import *
+from .breaker import CircuitBreaker
+from .bundle import DocBundle, DocBundleWriter
+from .crawler import DocCrawler
+from .extract import extract_page
+from .http_cache import HTTPCache
+from .prefetch import Prefetcher
+from .processed_store import ProcessedStore
+from .versions import PythonVersionCatalogue
 from src.env import *
 
 
@@ -23,10 +38,22 @@ def _no_internet(url: str) -> NoReturn:
     raise FetchUnsuccessfulOrImpossible(f"Error fetching the content from: {url}")
 
 
+def _is_transient(e: BaseException) -> bool:
+    """
+    Whether a failed request is worth retrying, and says something about the health of the server:
+    connection errors, timeouts, and `5xx`/`429` answers.
+    """
+    if isinstance(e, req_exc.HTTPError):
+        return e.response is not None and (
+            e.response.status_code >= 500 or e.response.status_code == 429
+        )
+    return isinstance(e, (req_exc.ConnectionError, req_exc.Timeout))
+
+
 class PythonFetch:
     """
     A class for fetching and processing Python documentation content based on specified versions
-    and document modes. It handles retries, cleans HTML content, and saves it as temporary files.
+    and document modes. It handles retries, cleans HTML content, and keeps it in the processed store.
     """
 
     def __init__(self) -> None:
@@ -42,11 +69,56 @@ class PythonFetch:
             "modules": "modules.html",
         }
         """Supported documents."""
-        self.PY_VERSIONS: StringList = self.__get_py_vers()
-        """The list of every Python version available."""
+        self.__http_cache = HTTPCache(Path(CACHE_FOLDER) / "http", flags.httpCacheTTL)
+        """On-disk cache of the downloaded pages, revalidated with conditional GETs."""
+        self.__breaker = CircuitBreaker(
+            self.__docs_url, flags.breakerThreshold, flags.breakerCooldown
+        )
+        """While the documentation server is unhealthy, requests fail fast (or use stale cache)."""
+        self.__store = ProcessedStore(
+            Path(CACHE_FOLDER) / "processed",
+            flags.processedCacheMB * 1024 * 1024,
+            flags.compressCache,
+        )
+        """Processed pages, addressed by the hash of the raw page. A hit skips parsing completely."""
+        self.__session: Session = self.__new_session()
+        """Long-lived session, its connection pool keeps the connections alive between requests."""
+        self.__workers = ThreadPoolExecutor(
+            max_workers=flags.fetchWorkers, thread_name_prefix="PythonFetch"
+        )
+        """Bounded pool used to fetch the pages of list-valued documents concurrently."""
+        self.__catalogue = PythonVersionCatalogue(
+            self.__session, Path(CACHE_FOLDER) / "py_versions.json", flags.pyVersionsTTL
+        )
+        """Persisted list of Python versions, refreshed in the background."""
+        self.__bundle_path: Path = Path(
+            flags.docBundle or Path(CACHE_FOLDER) / "docs.bundle"
+        )
+        """Location of the offline documentation bundle."""
+        self.__bundle: Optional[DocBundle] = self.__open_bundle()
+        """Offline documentation, pages found here never reach the network."""
+        self.__prefetcher = Prefetcher(self.__fetch_page)
+        """Warms the caches with the pages of the selected version."""
+        self.__crawler = DocCrawler(
+            self.__download,
+            self.__process,
+            flags.crawlHostConcurrency,
+            max(flags.fetchWorkers, flags.crawlHostConcurrency),
+        )
+        """Crawls whole documentation sets, beyond the supported documents."""
         self.DOCUMENT_LIST: StringList = list(self.__doc_type.keys())
         """The list of supported documents."""
 
+    @property
+    def PY_VERSIONS(self) -> StringList:
+        """
+        The list of every Python version available (last known list).
+        If flag 'deadInternet' is set, only the versions of the documentation bundle are available.
+        """
+        if flags.deadInternet and self.__bundle is not None:
+            return self.__bundle.versions
+        return self.__catalogue.versions
+
     def fetch_content(self, docs_type: str, py_ver: str) -> RawHTMLData:
         """
         Fetch the content of a specified Python documentation section for a specific version.
@@ -54,14 +126,185 @@ class PythonFetch:
         @param docs_type (str): The documentation type to fetch (e.g., "help", "controlflow").
         @param py_ver (str): The Python version (e.g., "3.9") for which the documentation is required.
 
-        @return KeyValues: A list of tuples containing fetched content and filenames or a single filename.
+        @return RawHTMLData: The plain text of every page, and the manifest (or bundle) it's kept in,
+        see `RawHTMLFile`. A single page is returned on its own.
 
         Raises:
             `ValueError`: If the specified Python version (`py_ver`) or `mode` is invalid.
             `DocumentModeIsInvalid`: If the specified mode is not available in `__doc_type`.
         """
         friendly.i_was_called(self.fetch_content)
+        doc_type: FlexibleString = self.__resolve(docs_type, py_ver)
+
+        results: RawHTMLData
+        logger.debug(self.__page_url(py_ver, ""))
+        # A running prefetch waits until the user's own fetch is done.
+        with self.__prefetcher.foreground():
+            if isinstance(doc_type, list):
+                # Every page is downloaded and processed in its own worker, `map` keeps the original order.
+                pages: RawHTMLFileList = list(
+                    self.__workers.map(
+                        lambda doc: self.__fetch_page(py_ver, doc), doc_type
+                    )
+                )
+                results = pages
+            else:  # is instance of str.
+                results = self.__fetch_page(py_ver, doc_type)
+
+        logger.debug(f"HTTP cache counters: {self.cache_stats()}")
+        return results
+
+    async def fetch_content_async(
+        self, docs_type: str, py_ver: str, timeout: Optional[float] = None
+    ) -> RawHTMLData:
+        """
+        Asynchronous version of `fetch_content`, the pages are fetched in the fetcher workers.
+
+        Cancelling the call, or reaching its `timeout`, cancels every page that didn't start yet;
+        pages already running finish in the background and are kept in the caches.
+
+        @param docs_type (str): The documentation type to fetch (e.g., "help", "controlflow").
+        @param py_ver (str): The Python version (e.g., "3.9") for which the documentation is required.
+        @param timeout (Optional[float]): Deadline of this call, in seconds. `None` waits forever.
+
+        @return RawHTMLData: The same content `fetch_content` returns.
+
+        Raises:
+            `TimeoutError`: If the deadline was reached.
+            Anything `fetch_content` raises.
+        """
+        friendly.i_was_called(self.fetch_content_async)
+        doc_type: FlexibleString = self.__resolve(docs_type, py_ver)
+        pages: StringList = doc_type if isinstance(doc_type, list) else [doc_type]
+
+        loop = asyncio.get_running_loop()
+        with self.__prefetcher.foreground():
+            fetched: RawHTMLFileList = await asyncio.wait_for(
+                asyncio.gather(
+                    *[
+                        loop.run_in_executor(
+                            self.__workers, self.__fetch_page, py_ver, page
+                        )
+                        for page in pages
+                    ]
+                ),
+                timeout,
+            )
+
+        logger.debug(f"HTTP cache counters: {self.cache_stats()}")
+        return fetched if isinstance(doc_type, list) else fetched[0]
 
+    def prefetch(self, py_ver: str) -> None:
+        """
+        Starts a low-priority background prefetch of every supported document of `py_ver`, so the
+        next `fetch_content` call for that version is served from the caches.
+        A prefetch of another version is cancelled.
+        """
+        friendly.i_was_called(self.prefetch)
+        self.__prefetcher.start(py_ver, self.__all_pages())
+
+    def crawl(
+        self,
+        py_ver: str,
+        max_depth: Optional[int] = None,
+        max_pages: Optional[int] = None,
+    ) -> RawHTMLFileMap:
+        """
+        Crawls the documentation of `py_ver` from its root, following same-site links.
+        Recrawls are incremental, unchanged pages are not processed again.
+
+        @param py_ver (str): The Python version (e.g., "3.13") to crawl.
+        @param max_depth (Optional[int]): Maximum link depth, `-crawlDepth` by default.
+        @param max_pages (Optional[int]): Maximum number of pages, `-crawlMaxPages` by default.
+        @return RawHTMLFileMap: The same content `fetch_content` produces, for every page, by URL.
+
+        Raises:
+            `FetchUnsuccessfulOrImpossible`: If flag 'deadInternet' is set.
+        """
+        friendly.i_was_called(self.crawl)
+        return {
+            url: self.__raw_file(processed)
+            for url, processed in self.__crawl(py_ver, max_depth, max_pages).items()
+        }
+
+    def build_bundle(
+        self,
+        versions: StringList,
+        path: Optional[str | Path] = None,
+        crawl: bool = False,
+    ) -> Path:
+        """
+        Packs the cleaned pages of every supported document, for every version in `versions`,
+        into one documentation bundle. The bundle is reloaded once it's written.
+
+        @param versions (StringList): The Python versions (e.g., ["3.12", "3.13"]) to pack.
+        @param path (Optional[str | Path]): Destination, the `-docBundle` location by default.
+        @param crawl (bool): Whether every page found by `crawl` is packed too. Pages outside of the
+        tutorial are packed under their path relative to it (e.g., "../library/os.html").
+        @return Path: The location of the written bundle.
+
+        Raises:
+            `FetchUnsuccessfulOrImpossible`: If flag 'deadInternet' is set, the pages are always
+            downloaded.
+        """
+        friendly.i_was_called(self.build_bundle)
+        if flags.deadInternet:
+            raise FetchUnsuccessfulOrImpossible(
+                "Building a documentation bundle is impossible, flag 'deadInternet' is set."
+            )
+
+        pages: StringList = self.__all_pages()
+        writer = DocBundleWriter(path or self.__bundle_path)
+        for ver in versions:
+            logger.info(f"Packing the documentation of Python {ver}.")
+            urls: StringList = [self.__page_url(ver, page) for page in pages]
+            for page, (extracted, _) in zip(
+                pages, self.__workers.map(self.__extract, urls)
+            ):
+                writer.add(ver, page, *extracted)
+            if not crawl:
+                continue
+            packed: set[str] = set(pages)
+            for url, (extracted, _) in self.__crawl(ver).items():
+                page: str = posixpath.relpath(url, self.__page_url(ver, ""))
+                if page not in packed:
+                    packed.add(page)
+                    writer.add(ver, page, *extracted)
+            logger.info(f"{len(packed)} pages of Python {ver} packed.")
+
+        replaces: bool = Path(path or self.__bundle_path) == self.__bundle_path
+        if replaces and self.__bundle is not None:
+            # The mapped file can't be replaced while it's open (Windows).
+            self.__bundle.close()
+            self.__bundle = None
+        written: Path = writer.close()
+
+        if replaces:
+            self.__bundle = self.__open_bundle()
+        return written
+
+    def close(self) -> None:
+        """Stops the workers and closes every pooled connection. Call this once the application shuts down."""
+        friendly.i_was_called(self.close)
+        self.__prefetcher.cancel()
+        self.__workers.shutdown(wait=False, cancel_futures=True)
+        self.__session.close()
+        self.__store.flush()
+        if self.__bundle is not None:
+            self.__bundle.close()
+
+    def cache_stats(self) -> dict[str, int]:
+        """Returns the hit/miss/revalidate counters of the HTTP cache."""
+        return self.__http_cache.stats()
+
+    def __resolve(self, docs_type: str, py_ver: str) -> FlexibleString:
+        """
+        Returns the page(s) of `docs_type`.
+
+        Raises:
+            `ValueError`: If the specified Python version (`py_ver`) is invalid.
+            `DocumentModeIsInvalid`: If the specified mode is not available in `__doc_type`.
+        """
         # Prepare the 'documents'
         doc_type: FlexibleStringData = self.__doc_type.get(docs_type, None)
         if doc_type is None:
@@ -71,45 +314,176 @@ class PythonFetch:
         logger.info(doc_type)
 
         # Check if `py_ver` is valid.
-        if py_ver not in self.PY_VERSIONS:
+        in_bundle: bool = self.__bundle is not None and py_ver in self.__bundle.versions
+        if py_ver not in self.PY_VERSIONS and not in_bundle:
             raise ValueError(f"Invalid version: '{py_ver}'")
 
-        # Build the URL
-        url: str = f"{self.__docs_url}{py_ver}/tutorial"
+        return doc_type
 
-        results: RawHTMLFileList = []
-        logger.debug(url)
-        if isinstance(doc_type, list):
-            for doc in doc_type:
-                results.append(self.__fetcher(f"{url}/{doc}"))
-            return results
-        # else, is instance of str.
-        return self.__fetcher(f"{url}/{doc_type}")
+    def __all_pages(self) -> StringList:
+        """Every page of every supported document."""
+        pages: StringList = []
+        for doc_type in self.__doc_type.values():
+            pages.extend(doc_type if isinstance(doc_type, list) else [doc_type])
+        return pages
+
+    def __page_url(self, py_ver: str, page: str) -> str:
+        return f"{self.__docs_url}{py_ver}/tutorial/{page}"
+
+    def __crawl(
+        self,
+        py_ver: str,
+        max_depth: Optional[int] = None,
+        max_pages: Optional[int] = None,
+    ) -> dict[str, tuple[ExtractedHTML, Path]]:
+        """
+        The processed pages of the crawl of `py_ver`, by URL. See `crawl`.
+
+        Raises:
+            `FetchUnsuccessfulOrImpossible`: If flag 'deadInternet' is set.
+        """
+        if flags.deadInternet:
+            raise FetchUnsuccessfulOrImpossible(
+                "Crawling is impossible, flag 'deadInternet' is set."
+            )
+
+        return self.__crawler.crawl(
+            f"{self.__docs_url}{py_ver}/",
+            Path(CACHE_FOLDER) / "crawl" / f"{py_ver}.json",
+            flags.crawlDepth if max_depth is None else max_depth,
+            flags.crawlMaxPages if max_pages is None else max_pages,
+        )
+
+    def __open_bundle(self) -> Optional[DocBundle]:
+        if not self.__bundle_path.is_file():
+            logger.info(f"There is no documentation bundle at '{self.__bundle_path}'.")
+            return None
+        try:
+            return DocBundle(self.__bundle_path)
+        except DocumentBundleIsInvalid as e:
+            logger.warning(f"Ignoring the documentation bundle: {e.args[0]}")
+            return None
 
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
-    def __get_response(self, session: Session, url: str) -> Response:
+    def __fetch_page(self, py_ver: str, page: str) -> RawHTMLFile:
         """
-        Send a GET request to the specified URL using a session, with retry logic.
+        Serves `page` from the documentation bundle if it's there, otherwise from the network.
+
+        Raises:
+            `FetchUnsuccessfulOrImpossible`: If the page is not bundled and flag 'deadInternet' is set.
+        """
+        if self.__bundle is not None and self.__bundle.has(py_ver, page):
+            logger.debug(f"Serving '{py_ver}/{page}' from the documentation bundle.")
+            return self.__bundle.text(py_ver, page), self.__bundle.path
+        if flags.deadInternet:
+            raise FetchUnsuccessfulOrImpossible(
+                f"'{py_ver}/{page}' is not in the documentation bundle, and flag 'deadInternet' is set."
+            )
+        return self.__fetcher(self.__page_url(py_ver, page))
+
+    def __new_session(self) -> Session:
+        """
+        Builds the shared session. The same adapter (and connection pool) is mounted for both
+        schemes, and the pool size is set by the `-httpPoolSize` flag.
+        """
+        adapter = HTTPAdapter(
+            pool_connections=flags.httpPoolSize,
+            pool_maxsize=flags.httpPoolSize,
+            pool_block=True,
+        )
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update(
+            {"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"}
+        )
+        return session
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_random_exponential(multiplier=1, max=8),
+        retry=retry_if_exception(_is_transient),
+        reraise=True,
+    )
+    def __get_response(self, url: str, headers: Optional[StringMap] = None) -> Response:
+        """
+        Send a GET request to the specified URL using the shared session, with retry logic.
+        Only transient errors are retried, with exponential backoff and full jitter.
 
-        @param session (Session): The requests session object to use for the request.
         @param url (str): The URL to fetch.
+        @param headers (Optional[StringMap]): Extra headers, e.g. the validators of a conditional GET.
 
         @return Response: The response object for the GET request.
 
         Exceptions are not handled within this scope.
         """
         friendly.i_was_called(self.__get_response)
-        ic(session, url)
-        with session.get(url, timeout=flags.connectTimeout) as response:
+        ic(url)
+        with self.__session.get(
+            url, headers=headers, timeout=flags.connectTimeout
+        ) as response:
             response.raise_for_status()
             return response
 
+    def __download(self, url: str) -> str:
+        """
+        Returns the body of `url`, going through the HTTP cache.
+
+        Fresh entries are served from disk. Stale entries are revalidated with a conditional GET,
+        so an unchanged page only costs a `304 Not Modified` answer.
+
+        While the circuit breaker is open, no request is sent: the stale entry is served if there
+        is one, otherwise this fails fast.
+        """
+        friendly.i_was_called(self.__download)
+
+        body: Optional[str] = self.__http_cache.fresh(url)
+        if body is not None:
+            logger.debug(f"HTTP cache hit: {url}")
+            return body
+
+        if not self.__breaker.allow():
+            return self.__fallback(url, f"circuit '{self.__docs_url}' is open")
+        try:
+            body = self.__revalidate(url)
+        except RequestException as e:
+            if not _is_transient(e):
+                # The server answered, it's healthy.
+                self.__breaker.success()
+                raise
+            self.__breaker.failure()
+            return self.__fallback(url, e)
+
+        self.__breaker.success()
+        return body
+
+    def __fallback(self, url: str, reason: object) -> str | NoReturn:
+        """Serves the stale copy of `url` if there is one, otherwise the fetch is impossible."""
+        body: Optional[str] = self.__http_cache.stale(url)
+        if body is None:
+            _no_internet(url)
+        logger.warning(f"Serving a stale copy of '{url}': {reason}")
+        return body
+
+    def __revalidate(self, url: str) -> str:
+        """Sends a (conditional) GET request for `url` and updates the HTTP cache."""
+        response: Response = self.__get_response(url, self.__http_cache.validators(url))
+        if response.status_code == 304:
+            body = self.__http_cache.revalidated(url)
+            if body is not None:
+                logger.debug(f"HTTP cache revalidated: {url}")
+                return body
+            # The cached body vanished, download it again without validators.
+            response = self.__get_response(url)
+
+        return self.__http_cache.store(url, response)
+
     def __fetcher(self, url: str) -> RawHTMLFile:
         """
-        Fetch content from a given URL, process it using Readability, and save the content to a file.
+        Fetch content from a given URL, process it, and keep the cleaned content in the processed store.
 
         @param url (str): The URL to fetch content from.
-        @return KeyValueTuple: A tuple containing the cleaned content and filename.
+        @return RawHTMLFile: The plain text, and the path of the manifest of the page in the processed
+        store.
 
         Raises:
             `RequestException`: If the request fails due to connectivity issues.
@@ -117,42 +491,15 @@ class PythonFetch:
         friendly.i_was_called(self.__fetcher)
         logger.debug(url)
 
-        html_content: Any = object()
         html_raw_text: str = ""
-        filename: str = ""
         filepath: Path = Path()
 
         try:
-            with requests.Session() as session:
-                response: Response = self.__get_response(session, url)
-
-            # Process the content with Readability
-            doc: Document = Document(response.text)
-            # Page title
-            title: str = doc.title()
-            # Simplified "reader mode" HTML
-            html_content: Any = doc.summary()
-
-            # Further clean the content using `lxml_html_clean`, we don't want trash!
-            cleaner = Cleaner(page_structure=True, safe_attrs_only=True)
-            html_content = cleaner.clean_html(html_content)
-
-            # We save the data as a temporal file (not implemented here)
-            filename = title.replace(" ", "") + ".html"
-            filepath = Path(CACHE_FOLDER) / filename
-
-            # Create the file if it doesn't exists, then open it.
-            filepath.parent.mkdir(parents=True, exist_ok=True)
-            with open(filepath, "w", encoding="utf-8") as file:
-                file.write(html_content)
-            logger.debug(f"Content saved to '{filename}'.")
-
-            # Remove every HTML element
-            soup = BeautifulSoup(html_content, "html.parser")
-            html_raw_text = soup.get_text().strip().replace("\n\n", "\n")
-
+            html_raw_text, filepath = self.__raw_file(self.__extract(url))
         except RequestException:
             _no_internet(url)
+        except FetchUnsuccessfulOrImpossible:
+            raise
         except Exception:
             logger.critical(
                 "An unresolved error occurred.", UnresolvedErrorWhileFetching
@@ -160,49 +507,33 @@ class PythonFetch:
 
         return html_raw_text, filepath
 
-    def __get_py_vers(self) -> StringList | NoReturn:
-        """
-        Fetch and extract available Python versions from the Python API.
-
-        @return StringList: A sorted list of available Python versions (major.minor).
+    def __raw_file(self, processed: tuple[ExtractedHTML, Path]) -> RawHTMLFile:
+        """Keeps the plain text and the manifest path of a processed page."""
+        (_, _, html_raw_text), filepath = processed
+        return html_raw_text, filepath
 
-        Raises:
-            `ValueError`: If an invalid version string is encountered.
-            `RequestException`: If the request to the Python API fails.
+    def __extract(self, url: str) -> tuple[ExtractedHTML, Path]:
         """
-        friendly.i_was_called(self.__get_py_vers)
-
-        PYTHON_API: LitStr = "https://www.python.org/api/v2/downloads/release/"
-        versions: set[Any] = set()
-
-        try:
-            with requests.Session() as session:
-                response: Response = self.__get_response(session, PYTHON_API)
+        Downloads `url` and processes it, unless the processed store already has that exact page.
 
-            data: list[GenericKeyMap] = response.json()  # GET JSON request.
-            logger.warning("LOADING PYTHON VERSIONS")
-            # Extract Python versions into the list.
-            for r in data:
-                if r["name"].startswith("Python 3.") and not r["pre_release"]:
-                    logger.info(f"Trying to fix {r['name']}.")
-
-                    # Find the first occurrence of "3."
-                    start: int = r["name"].find("3.")
-                    if start == -1:
-                        raise ValueError(f"Invalid version string for: {r['name']}.")
-
-                    # Extract the substring starting from "3."
-                    ver_substr: str = r["name"][start:]
+        @return tuple[ExtractedHTML, Path]: The page title, the cleaned HTML and the plain text;
+        and the path of the manifest of the page in the processed store.
+        """
+        return self.__process(url, self.__download(url))
 
-                    # Split the substring by '.' and take the first two parts
-                    major_minor: str = ".".join(ver_substr.split(".")[:2])
-                    versions.add(major_minor)
-            logger.info("Python versions loaded successfully.")
+    def __process(self, url: str, page: str) -> tuple[ExtractedHTML, Path]:
+        """Processes the downloaded `page` of `url`, going through the processed store."""
+        key: str = self.__store.key(page)
 
-        except RequestException:
-            _no_internet(PYTHON_API)
+        stored: Optional[tuple[ExtractedHTML, Path]] = self.__store.get(key)
+        if stored is not None:
+            logger.debug(f"Processed store hit: {url}")
+            return stored
 
-        return sorted(versions)
+        extracted: ExtractedHTML = extract_page(page)
+        filepath: Path = self.__store.put(key, extracted)
+        logger.debug(f"Content of '{extracted[0]}' saved to '{filepath.name}'.")
+        return extracted, filepath
 
 
 py_fetch = PythonFetch()
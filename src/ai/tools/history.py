@@ -0,0 +1,212 @@
+import hashlib
+import re
+import threading
+
+from src.env import *
+
+from .images import ImageRef
+from .retrieval import estimate_tokens
+
+_PROMPT: str = "Following this documentation:\n\n{context}\n\nAnswer this:{question}"
+"""Format of a question asked about some documentation."""
+_IMAGE_TOKENS: int = 258
+"""Tokens an image costs in a Gemini prompt."""
+_SENTENCE = re.compile(r"(?<=[.!?])\s")
+_SUMMARY_LINE: int = 200
+"""Maximum characters of a question or an answer in the summary of evicted turns."""
+
+
+def prompt_tokens(contents: MemoryList) -> int:
+    """(Estimated) tokens of the contents of a `generate_content` call."""
+    return sum(
+        estimate_tokens(part) if isinstance(part, str) else _IMAGE_TOKENS
+        for content in contents
+        for part in content["parts"]
+    )
+
+
+def payload_bytes(contents: MemoryList) -> int:
+    """Size of the text and the images of the contents of a `generate_content` call."""
+    return sum(
+        len(part.encode("utf-8")) if isinstance(part, str) else len(part["data"])
+        for content in contents
+        for part in content["parts"]
+    )
+
+
+class ChatHistory:
+    """
+    The conversation sent to the model, kept within a token budget.
+
+    - Only the latest question carries its documentation context; older questions are sent alone,
+      so the documentation is never sent twice in the same prompt.
+    - The oldest turns are evicted once the prompt exceeds the budget (sliding window). If
+      `summarize` is set, the evicted turns are replaced by a short local summary of them.
+
+    Several questions can wait for their answers at the same time: every answer is kept right
+    after its question, and the prompt of a question leaves the other unanswered questions out.
+    """
+
+    def __init__(self, token_budget: int, summarize: bool) -> None:
+        """
+        @param token_budget (int): Maximum (estimated) tokens of the prompt. The latest question is
+        always sent, even if it alone exceeds the budget.
+        @param summarize (bool): Whether evicted turns are summarized, instead of being dropped.
+        """
+        self.__token_budget: int = token_budget
+        self.__summarize: bool = summarize
+        self.__lock = threading.Lock()
+        self.__turns: list[GenericKeyMap] = []
+        """`{"id", "role", "text", "context", "media"}` of every turn, oldest first."""
+        self.__next_id: int = 0
+
+    def __len__(self) -> int:
+        return len(self.__turns)
+
+    def add_user(
+        self,
+        text: str,
+        context: Optional[str] = None,
+        media: Optional[list[ImageRef]] = None,
+    ) -> int:
+        """
+        @param text (str): The question (or any message) of the user.
+        @param context (Optional[str]): The documentation `text` is about.
+        @param media (Optional[list[ImageRef]]): Images attached to `text`. Their bytes are only
+        read when a prompt is built.
+        @return int: The identifier of the turn, see `add_model`, `drop` and `build`.
+        """
+        with self.__lock:
+            self.__next_id += 1
+            self.__turns.append(
+                {
+                    "id": self.__next_id,
+                    "role": "user",
+                    "text": text,
+                    "context": context,
+                    "media": media or [],
+                }
+            )
+            return self.__next_id
+
+    def add_model(self, text: str, reply_to: int) -> None:
+        """Adds the answer to the question `reply_to`, right after it."""
+        with self.__lock:
+            try:
+                index: int = self.__index(reply_to)
+            except StopIteration:
+                # The question was forgotten (e.g. `clear`) while it was being answered.
+                return
+            self.__turns.insert(
+                index + 1,
+                {
+                    "id": reply_to,
+                    "role": "model",
+                    "text": text,
+                    "context": None,
+                    "media": [],
+                },
+            )
+
+    def fingerprint(self) -> str:
+        """
+        Hash of the text of every turn, the answers included. Two conversations with the same
+        fingerprint give the same meaning to a follow-up question (e.g., "why?").
+        """
+        h = hashlib.sha256()
+        with self.__lock:
+            for t in self.__turns:
+                h.update(f"{t['role']}\0{t['text']}\0".encode("utf-8"))
+        return h.hexdigest()
+
+    def drop(self, turn: int) -> None:
+        """Forgets the question `turn` and its answer, e.g. a question the model failed to answer."""
+        with self.__lock:
+            self.__turns = [t for t in self.__turns if t["id"] != turn]
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__turns.clear()
+
+    def build(self, turn: int) -> MemoryList:
+        """
+        Returns the contents of the `generate_content` call of the question `turn` and logs their
+        size: the answered turns before it, then the question.
+        """
+        with self.__lock:
+            answered: set[int] = {t["id"] for t in self.__turns if t["role"] == "model"}
+            turns: list[GenericKeyMap] = [
+                t
+                for t in self.__turns[: self.__index(turn) + 1]
+                if t["id"] in answered or t["id"] == turn
+            ]
+            last_user: int = len(turns) - 1
+            rendered: list[GenericKeyMap] = [
+                self.__render(t, i == last_user) for i, t in enumerate(turns)
+            ]
+            sizes: list[int] = [prompt_tokens([content]) for content in rendered]
+
+            # Sliding window: keep the newest turns that fit, starting at a question.
+            budget: int = self.__token_budget
+            if self.__summarize:
+                budget -= self.__token_budget // 4
+            start: int = max(last_user, 0)
+            used: int = sum(sizes[start:])
+            for i in range(start - 1, -1, -1):
+                if used + sizes[i] > budget:
+                    break
+                used += sizes[i]
+                if turns[i]["role"] == "user":
+                    start = i
+
+            contents: MemoryList = rendered[start:]
+            summary: str = ""
+            if start > 0 and self.__summarize and contents:
+                summary = self.__summary(turns[:start])
+                first: GenericKeyMap = contents[0]
+                contents[0] = {
+                    "role": first["role"],
+                    "parts": [f"{summary}\n\n{first['parts'][0]}", *first["parts"][1:]],
+                }
+
+            logger.info(
+                f"Prompt: {len(contents)}/{len(turns)} turns, "
+                f"~{sum(sizes[start:]) + estimate_tokens(summary)} tokens "
+                f"({start} older turns {'summarized' if summary else 'dropped'})."
+            )
+            return contents
+
+    def __index(self, turn: int) -> int:
+        """Position of the question `turn`."""
+        return next(
+            i
+            for i, t in enumerate(self.__turns)
+            if t["id"] == turn and t["role"] == "user"
+        )
+
+    def __render(self, turn: GenericKeyMap, with_context: bool) -> GenericKeyMap:
+        text: str = turn["text"]
+        if with_context and turn["context"]:
+            text = _PROMPT.format(context=turn["context"], question=text)
+        return {
+            "role": turn["role"],
+            "parts": [text, *(image.blob() for image in turn["media"])],
+        }
+
+    def __summary(self, turns: list[GenericKeyMap]) -> str:
+        """
+        A local (no API call) summary of `turns`: every question, and the first sentence of every
+        answer. The oldest lines are dropped to fit a quarter of the budget.
+        """
+        lines: StringList = []
+        for turn in turns:
+            text: str = " ".join(turn["text"].split())
+            if turn["role"] == "model":
+                text = _SENTENCE.split(text, 1)[0]
+            prefix: str = "Q" if turn["role"] == "user" else "A"
+            lines.append(f"- {prefix}: {text[:_SUMMARY_LINE]}")
+
+        header: str = "Summary of the earlier conversation:"
+        while lines and estimate_tokens("\n".join(lines)) > self.__token_budget // 4:
+            lines.pop(0)
+        return "\n".join([header, *lines])
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from requests import Response
+
+from .atomic import write_atomic
+from src.env import *
+
+
+class HTTPCache:
+    """
+    An on-disk HTTP cache keyed by URL. Every entry stores the downloaded body together with its
+    `ETag`/`Last-Modified` validators, so stale entries can be revalidated with a conditional GET
+    instead of being downloaded again.
+    """
+
+    def __init__(self, folder: str | Path, ttl: int) -> None:
+        """
+        @param folder (str | Path): The folder where the cached entries are saved.
+        @param ttl (int): Freshness lifetime of an entry, in seconds.
+        """
+        self.__folder: Path = Path(folder)
+        """Root folder of the cache."""
+        self.__ttl: int = ttl
+        """Freshness lifetime (seconds). Fresh entries are served without any network round-trip."""
+        self.__lock = threading.Lock()
+        """Guards the counters. The files are replaced atomically, see `write_atomic`."""
+        self.__counters: dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "revalidated": 0,
+            "stale": 0,
+        }
+        """
+        - "hits": Served from disk without touching the network.
+        - "misses": Downloaded in full.
+        - "revalidated": Confirmed by the server with a `304 Not Modified` answer.
+        - "stale": Served past its TTL because the server was unreachable.
+        """
+
+    def fresh(self, url: str) -> Optional[str]:
+        """
+        Returns the cached body of `url` if the entry is still inside its TTL, otherwise `None`.
+        """
+        meta: Optional[GenericKeyMap] = self.__read_meta(url)
+        if meta is None or time.time() - meta["fetched_at"] > self.__ttl:
+            return None
+
+        body: Optional[str] = self.__read_body(url)
+        if body is not None:
+            self.__count("hits")
+        return body
+
+    def stale(self, url: str) -> Optional[str]:
+        """
+        Returns the cached body of `url` regardless of its age, or `None` if nothing is cached.
+        Use it as a fallback while the server is unreachable.
+        """
+        body: Optional[str] = self.__read_body(url)
+        if body is not None:
+            self.__count("stale")
+        return body
+
+    def validators(self, url: str) -> StringMap:
+        """
+        Builds the headers of a conditional GET request for `url`.
+        If nothing is cached (or the server didn't send validators), the map is empty.
+        """
+        meta: Optional[GenericKeyMap] = self.__read_meta(url)
+        headers: StringMap = {}
+        if meta is None:
+            return headers
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def revalidated(self, url: str) -> Optional[str]:
+        """
+        Handles a `304 Not Modified` answer: the stored entry becomes fresh again and its body is
+        returned. Returns `None` if the body is missing from disk.
+        """
+        meta: Optional[GenericKeyMap] = self.__read_meta(url)
+        body: Optional[str] = self.__read_body(url)
+        if meta is None or body is None:
+            return None
+
+        meta["fetched_at"] = time.time()
+        write_atomic(self.__meta_path(url), json.dumps(meta))
+        self.__count("revalidated")
+        return body
+
+    def store(self, url: str, response: Response) -> str:
+        """Saves a full (`200 OK`) response and returns its body."""
+        body: str = response.text
+        meta: GenericKeyMap = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+        }
+        write_atomic(self.__body_path(url), body)
+        write_atomic(self.__meta_path(url), json.dumps(meta))
+        self.__count("misses")
+        return body
+
+    def stats(self) -> dict[str, int]:
+        """Returns a copy of the hit/miss/revalidate counters."""
+        with self.__lock:
+            return dict(self.__counters)
+
+    def __count(self, counter: str) -> None:
+        with self.__lock:
+            self.__counters[counter] += 1
+
+    def __key(self, url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def __body_path(self, url: str) -> Path:
+        return self.__folder / f"{self.__key(url)}.html"
+
+    def __meta_path(self, url: str) -> Path:
+        return self.__folder / f"{self.__key(url)}.json"
+
+    def __read_meta(self, url: str) -> Optional[GenericKeyMap]:
+        try:
+            return json.loads(self.__meta_path(url).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def __read_body(self, url: str) -> Optional[str]:
+        try:
+            return self.__body_path(url).read_text(encoding="utf-8")
+        except OSError:
+            return None
@@ -0,0 +1,129 @@
+import hashlib
+import io
+import threading
+from pathlib import Path
+from PIL import Image, ImageOps
+
+from .atomic import write_atomic
+from src.env import *
+
+_MIME_TYPES: StringMap = {
+    "WEBP": "image/webp",
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+}
+"""Formats the images can be re-encoded to (all of them accepted by Gemini)."""
+
+
+class ImageRef:
+    """A prepared image, referenced by the hash of its content. Its bytes stay on disk."""
+
+    __slots__ = ("digest", "path", "mime_type")
+
+    def __init__(self, digest: str, path: Path, mime_type: str) -> None:
+        self.digest: str = digest
+        self.path: Path = path
+        self.mime_type: str = mime_type
+
+    def blob(self) -> GenericKeyMap:
+        """The image as a part of a `generate_content` call."""
+        return {"mime_type": self.mime_type, "data": self.path.read_bytes()}
+
+    def __repr__(self) -> str:
+        return f"ImageRef({self.digest[:12]}, {self.mime_type})"
+
+
+class ImageStore:
+    """
+    Prepares the images sent to the model: they are downsized to `max_side` pixels, re-encoded to
+    `image_format` and stripped of their metadata (EXIF, ICC profiles, comments...).
+
+    The prepared bytes are saved on disk under the hash of the original pixels, so the same image is
+    only prepared once; after that, it's only referenced by its hash (see `ImageRef`).
+    """
+
+    def __init__(
+        self, folder: str | Path, max_side: int, image_format: str, quality: int
+    ) -> None:
+        """
+        @param folder (str | Path): The folder of the prepared images.
+        @param max_side (int): Maximum width and height (pixels) of a prepared image.
+        @param image_format (str): "WEBP", "JPEG" or "PNG".
+        @param quality (int): Encoding quality (1-100) of the lossy formats.
+
+        Raises:
+            `ValueError`: If `image_format` isn't supported.
+        """
+        self.__format: str = image_format.upper()
+        if self.__format not in _MIME_TYPES:
+            raise ValueError(
+                f"Image format '{image_format}' is invalid, expected one of {list(_MIME_TYPES)}."
+            )
+        self.__folder: Path = Path(folder)
+        self.__max_side: int = max_side
+        self.__quality: int = quality
+        self.__lock = threading.Lock()
+        self.__counters: dict[str, int] = {
+            "prepared": 0,
+            "reused": 0,
+            "bytes_in": 0,
+            "bytes_out": 0,
+        }
+        """
+        - "prepared": Images resized and re-encoded.
+        - "reused": Images already prepared.
+        - "bytes_in": Raw (decoded) size of the prepared images.
+        - "bytes_out": Encoded size of the prepared images.
+        """
+
+    def prepare(self, image: ImageFile) -> ImageRef:
+        """
+        @param image (ImageFile): The image of the user.
+        @return ImageRef: The prepared image.
+        """
+        raw: bytes = image.tobytes()
+        digest: str = hashlib.sha256(
+            f"{image.mode}{image.size}{self.__max_side}{self.__format}{self.__quality}".encode(
+                "utf-8"
+            )
+            + raw
+        ).hexdigest()
+        path: Path = self.__folder / f"{digest}.{self.__format.lower()}"
+        ref = ImageRef(digest, path, _MIME_TYPES[self.__format])
+        if path.exists():
+            with self.__lock:
+                self.__counters["reused"] += 1
+            logger.debug(f"Image already prepared: {ref}.")
+            return ref
+
+        data: bytes = self.__encode(image)
+        write_atomic(path, data)
+        with self.__lock:
+            self.__counters["prepared"] += 1
+            self.__counters["bytes_in"] += len(raw)
+            self.__counters["bytes_out"] += len(data)
+        logger.info(
+            f"Image prepared: {image.size} -> {self.__max_side}px max, "
+            f"{len(raw)} -> {len(data)} bytes ({ref})."
+        )
+        return ref
+
+    def stats(self) -> dict[str, int]:
+        with self.__lock:
+            return dict(self.__counters)
+
+    def __encode(self, image: ImageFile) -> bytes:
+        # The orientation is applied to the pixels, before the EXIF data is dropped.
+        prepared: Image.Image = ImageOps.exif_transpose(image)
+        alpha: bool = "A" in prepared.getbands() or "transparency" in prepared.info
+        prepared = prepared.convert(
+            "RGBA" if alpha and self.__format != "JPEG" else "RGB"
+        )
+        prepared.info = {}
+        prepared.thumbnail((self.__max_side, self.__max_side), Image.Resampling.LANCZOS)
+
+        buffer = io.BytesIO()
+        prepared.save(
+            buffer, self.__format, quality=self.__quality, optimize=True, exif=b""
+        )
+        return buffer.getvalue()
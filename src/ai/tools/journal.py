@@ -0,0 +1,57 @@
+import json
+import queue
+import threading
+import time
+from pathlib import Path
+
+from src.env import *
+
+
+class TranscriptJournal:
+    """
+    An append-only JSONL transcript. Records are written by a background thread, so the callers
+    never wait for the disk; every line is one JSON object with a "time" key.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        """
+        @param path (str | Path): The JSONL file, it's created if needed.
+        """
+        self.__path: Path = Path(path)
+        self.__queue: queue.Queue[Optional[GenericKeyMap]] = queue.Queue()
+        self.__lock = threading.Lock()
+        self.__thread: Optional[threading.Thread] = None
+        """The writer, started by the first record."""
+
+    def write(self, record: GenericKeyMap) -> None:
+        """Queues `record` to be appended."""
+        with self.__lock:
+            if self.__thread is None:
+                self.__thread = threading.Thread(
+                    target=self.__run, name="TranscriptJournal", daemon=True
+                )
+                self.__thread.start()
+        self.__queue.put({"time": time.time(), **record})
+
+    def close(self) -> None:
+        """Writes the queued records and stops the writer."""
+        with self.__lock:
+            thread, self.__thread = self.__thread, None
+        if thread is not None:
+            self.__queue.put(None)
+            thread.join()
+
+    def __run(self) -> None:
+        self.__path.parent.mkdir(parents=True, exist_ok=True)
+        with self.__path.open("a", encoding="utf-8") as file:
+            while True:
+                record: Optional[GenericKeyMap] = self.__queue.get()
+                if record is None:
+                    return
+                try:
+                    file.write(json.dumps(record, default=str) + "\n")
+                except (OSError, TypeError, ValueError) as e:
+                    logger.warning(f"Failed to write the transcript: {e}")
+                # Flush once the backlog is written.
+                if self.__queue.empty():
+                    file.flush()
@@ -0,0 +1,75 @@
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from src.env import *
+
+
+class Prefetcher:
+    """
+    Warms the caches with every page of one Python version, in a background thread.
+
+    The prefetch is low priority: pages are fetched one at a time, and it pauses while any
+    foreground fetch (see `foreground`) is running. Starting a new prefetch cancels the previous one.
+    """
+
+    def __init__(self, fetch_page: Callable[[str, str], object]) -> None:
+        """
+        @param fetch_page (Callable[[str, str], object]): Fetches (and caches) one page,
+        it's called with the Python version and the page name.
+        """
+        self.__fetch_page: Callable[[str, str], object] = fetch_page
+        self.__lock = threading.Lock()
+        self.__cancelled: threading.Event = threading.Event()
+        """Cancel flag of the running prefetch."""
+        self.__idle: threading.Event = threading.Event()
+        """Set while no foreground fetch is running."""
+        self.__idle.set()
+        self.__foreground: int = 0
+        """Number of running foreground fetches."""
+
+    def start(self, py_ver: str, pages: StringList) -> None:
+        """Cancels the running prefetch (if any) and starts prefetching `pages` of `py_ver`."""
+        friendly.i_was_called(self.start)
+        with self.__lock:
+            self.__cancelled.set()
+            self.__cancelled = threading.Event()
+            threading.Thread(
+                target=self.__run,
+                args=(py_ver, list(pages), self.__cancelled),
+                name=f"Prefetcher-{py_ver}",
+                daemon=True,
+            ).start()
+
+    def cancel(self) -> None:
+        """Cancels the running prefetch. The page being fetched right now is completed."""
+        with self.__lock:
+            self.__cancelled.set()
+
+    @contextmanager
+    def foreground(self) -> Iterator[None]:
+        """Pauses the prefetch while the body of the `with` statement runs."""
+        with self.__lock:
+            self.__foreground += 1
+            self.__idle.clear()
+        try:
+            yield
+        finally:
+            with self.__lock:
+                self.__foreground -= 1
+                if self.__foreground == 0:
+                    self.__idle.set()
+
+    def __run(self, py_ver: str, pages: StringList, cancelled: threading.Event) -> None:
+        logger.info(f"Prefetching {len(pages)} pages of Python {py_ver}.")
+        for page in pages:
+            self.__idle.wait()
+            if cancelled.is_set():
+                logger.info(f"Prefetch of Python {py_ver} was cancelled.")
+                return
+            try:
+                self.__fetch_page(py_ver, page)
+            except Exception as e:
+                logger.warning(f"Prefetch of Python {py_ver} stopped at '{page}': {e}")
+                return
+        logger.info(f"Every page of Python {py_ver} was prefetched.")
@@ -0,0 +1,243 @@
+import gzip
+import hashlib
+import json
+import re
+import threading
+import time
+import zlib
+from pathlib import Path
+
+from .atomic import write_atomic
+from src.env import *
+
+_FORMAT: int = 2
+"""Layout version of the store. Older layouts are discarded when the store is opened."""
+_HTML_BOUNDARY = re.compile(r"(?=<(?:section|h[1-3])[\s>])", re.IGNORECASE)
+"""A section of cleaned HTML starts at every `<section>` and `<h1>`-`<h3>` tag."""
+_TEXT_CUT_MASK: int = 0b111
+"""A plain text section ends after a line whose CRC32 has these bits clear (~8 lines)."""
+_TEXT_MAX_LINES: int = 64
+
+
+def _split_html(html: str) -> StringList:
+    """Splits cleaned HTML at its structural boundaries. Joining the parts rebuilds `html`."""
+    return [part for part in _HTML_BOUNDARY.split(html) if part]
+
+
+def _split_text(text: str) -> StringList:
+    """
+    Splits plain text into content-defined sections of whole lines. Boundaries depend on the lines
+    themselves, not on their offsets, so two versions of a page that only differ in one paragraph
+    share every other section. Joining the parts rebuilds `text`.
+    """
+    parts: StringList = []
+    current: StringList = []
+    for line in text.splitlines(keepends=True):
+        current.append(line)
+        if (
+            zlib.crc32(line.encode("utf-8")) & _TEXT_CUT_MASK == 0
+            or len(current) >= _TEXT_MAX_LINES
+        ):
+            parts.append("".join(current))
+            current = []
+    if current:
+        parts.append("".join(current))
+    return parts
+
+
+class ProcessedStore:
+    """
+    Content-addressed store for processed pages (cleaned HTML and plain text).
+
+    Entries are keyed by the SHA-256 of the raw downloaded page, so a page that didn't change is
+    never parsed twice, and different pages can't overwrite each other. The total size of the store
+    is capped; once it's exceeded, the least recently used entries are evicted.
+
+    Pages are split into sections, and every section is stored once under its own hash. A page
+    only keeps a manifest (its title and the list of its sections) and is rebuilt on read, so the
+    copies of a page shared by several Python versions cost roughly the space of one.
+
+    Layout (inside `folder`):
+    - `sections/<hash>[.gz]`: One unique section.
+    - `manifests/<key>.json`: `{"title", "html": [hash, ...], "text": [hash, ...]}`.
+    - `index.json`: Access times and sizes of the pages, and reference counts of the sections.
+    """
+
+    def __init__(self, folder: str | Path, max_bytes: int, compress: bool) -> None:
+        """
+        @param folder (str | Path): The folder of the store.
+        @param max_bytes (int): Size cap of the stored files, in bytes.
+        @param compress (bool): Whether new sections are compressed (gzip) on disk.
+        """
+        self.__folder: Path = Path(folder)
+        self.__index_path: Path = self.__folder / "index.json"
+        self.__max_bytes: int = max_bytes
+        self.__compress: bool = compress
+        self.__lock = threading.RLock()
+        self.__pages: dict[str, GenericKeyMap] = {}
+        """`key -> {"size", "logical", "atime", "sections"}`"""
+        self.__sections: dict[str, GenericKeyMap] = {}
+        """`hash -> {"size", "refs", "compressed"}`"""
+
+        self.__load_index()
+
+    @staticmethod
+    def key(raw_page: str) -> str:
+        """The content address of a raw page."""
+        return hashlib.sha256(raw_page.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[tuple[ExtractedHTML, Path]]:
+        """
+        Returns the processed page and the path of its manifest, or `None` on a miss.
+        """
+        with self.__lock:
+            entry: Optional[GenericKeyMap] = self.__pages.get(key, None)
+            if entry is None:
+                return None
+            try:
+                manifest: GenericKeyMap = json.loads(
+                    self.__manifest_path(key).read_text(encoding="utf-8")
+                )
+                html: str = "".join(self.__read_section(h) for h in manifest["html"])
+                text: str = "".join(self.__read_section(h) for h in manifest["text"])
+            except (OSError, ValueError, KeyError):
+                # Somebody removed the files, forget the entry.
+                self.__release(key)
+                return None
+            entry["atime"] = time.time()
+            return (manifest["title"], html, text), self.__manifest_path(key)
+
+    def put(self, key: str, extracted: ExtractedHTML) -> Path:
+        """Stores a processed page, evicting old entries if needed, and returns the path of its manifest."""
+        title, html, text = extracted
+        with self.__lock:
+            if key in self.__pages:
+                self.__release(key)
+
+            manifest: GenericKeyMap = {
+                "title": title,
+                "html": [self.__add_section(part) for part in _split_html(html)],
+                "text": [self.__add_section(part) for part in _split_text(text)],
+            }
+            unique: StringList = sorted(set(manifest["html"] + manifest["text"]))
+            for h in unique:
+                self.__sections[h]["refs"] += 1
+
+            manifest_path: Path = self.__manifest_path(key)
+            self.__pages[key] = {
+                "size": write_atomic(manifest_path, json.dumps(manifest)),
+                "logical": len(html.encode("utf-8")) + len(text.encode("utf-8")),
+                "atime": time.time(),
+                "sections": unique,
+            }
+            self.__evict(keep=key)
+            self.flush()
+            logger.debug(f"Processed store: {self.stats()}")
+            return manifest_path
+
+    def flush(self) -> None:
+        """Persists the index (access times included)."""
+        with self.__lock:
+            index: GenericKeyMap = {
+                "format": _FORMAT,
+                "pages": self.__pages,
+                "sections": self.__sections,
+            }
+            write_atomic(self.__index_path, json.dumps(index))
+
+    def size(self) -> int:
+        """Total size (bytes) of the stored files."""
+        with self.__lock:
+            return sum(p["size"] for p in self.__pages.values()) + sum(
+                s["size"] for s in self.__sections.values()
+            )
+
+    def stats(self) -> dict[str, int]:
+        """
+        - "pages": Stored pages.
+        - "sections": Unique sections.
+        - "bytes": Size of the stored files.
+        - "logical_bytes": Size the pages would take without deduplication (uncompressed).
+        """
+        with self.__lock:
+            return {
+                "pages": len(self.__pages),
+                "sections": len(self.__sections),
+                "bytes": self.size(),
+                "logical_bytes": sum(p["logical"] for p in self.__pages.values()),
+            }
+
+    def __add_section(self, part: str) -> str:
+        """Stores `part` unless an identical section exists, and returns its hash."""
+        h: str = hashlib.sha256(part.encode("utf-8")).hexdigest()
+        if h not in self.__sections:
+            data: bytes = part.encode("utf-8")
+            if self.__compress:
+                data = gzip.compress(data)
+            self.__sections[h] = {
+                "size": write_atomic(self.__section_path(h, self.__compress), data),
+                "refs": 0,
+                "compressed": self.__compress,
+            }
+        return h
+
+    def __read_section(self, h: str) -> str:
+        compressed: bool = self.__sections[h]["compressed"]
+        data: bytes = self.__section_path(h, compressed).read_bytes()
+        if compressed:
+            data = gzip.decompress(data)
+        return data.decode("utf-8")
+
+    def __release(self, key: str) -> None:
+        """Removes a page; sections that no other page references are removed too."""
+        entry: GenericKeyMap = self.__pages.pop(key)
+        self.__manifest_path(key).unlink(missing_ok=True)
+        for h in entry["sections"]:
+            section: Optional[GenericKeyMap] = self.__sections.get(h, None)
+            if section is None:
+                continue
+            section["refs"] -= 1
+            if section["refs"] <= 0:
+                self.__section_path(h, section["compressed"]).unlink(missing_ok=True)
+                del self.__sections[h]
+
+    def __evict(self, keep: str) -> None:
+        """
+        Removes the least recently used pages until the store fits its cap.
+        The page `keep` (the one just stored) is never evicted.
+        """
+        for key in sorted(self.__pages, key=lambda k: self.__pages[k]["atime"]):
+            if self.size() <= self.__max_bytes:
+                break
+            if key == keep:
+                continue
+            self.__release(key)
+            logger.debug(f"Evicted processed page {key}.")
+
+    def __load_index(self) -> None:
+        try:
+            index: GenericKeyMap = json.loads(
+                self.__index_path.read_text(encoding="utf-8")
+            )
+        except (OSError, ValueError):
+            return
+
+        if index.get("format", None) != _FORMAT:
+            # Files of an older layout are not referenced by anything, remove them.
+            logger.info("Discarding the processed store of an older layout.")
+            for path in self.__folder.glob("*.*"):
+                if path != self.__index_path:
+                    path.unlink(missing_ok=True)
+            return
+
+        self.__pages = index["pages"]
+        self.__sections = index["sections"]
+        # Drop the pages whose manifest is gone.
+        for key in [k for k in self.__pages if not self.__manifest_path(k).is_file()]:
+            self.__release(key)
+
+    def __manifest_path(self, key: str) -> Path:
+        return self.__folder / "manifests" / f"{key}.json"
+
+    def __section_path(self, h: str, compressed: bool) -> Path:
+        return self.__folder / "sections" / f"{h}{'.gz' if compressed else ''}"
@@ -0,0 +1,235 @@
+import hashlib
+import math
+import re
+import threading
+import time
+from collections import Counter
+from typing import TYPE_CHECKING
+
+from src.env import *
+
+if TYPE_CHECKING:
+    # `digests` imports `HEADING` from this module.
+    from .digests import DigestStore
+
+_WORD = re.compile(r"\w+")
+HEADING = re.compile(r"^\d+(\.\d+)*\.?\s+\S")
+"""Numbered section titles, e.g. "4.1. if Statements". Chunks and digests start at them."""
+_K1: float = 1.5
+_B: float = 0.75
+
+
+def estimate_tokens(text: str) -> int:
+    """A rough token count of `text` (~4 characters per token), good enough for budgets."""
+    return (len(text) + 3) // 4
+
+
+def _terms(text: str) -> StringList:
+    return _WORD.findall(text.lower())
+
+
+def _chunk(text: str, max_tokens: int) -> StringList:
+    """
+    Splits the plain text of a page into chunks. A chunk starts at every section title, and
+    paragraphs (lines) are grouped until `max_tokens`; a longer paragraph is split between words.
+    """
+    chunks: StringList = []
+    current: StringList = []
+    size: int = 0
+
+    def close() -> None:
+        nonlocal current, size
+        if current:
+            chunks.append("\n".join(current))
+        current, size = [], 0
+
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if HEADING.match(line):
+            close()
+        tokens: int = estimate_tokens(line)
+        if tokens > max_tokens:
+            close()
+            words: StringList = line.split()
+            step: int = max(1, len(words) * max_tokens // tokens)
+            chunks.extend(
+                " ".join(words[i : i + step]) for i in range(0, len(words), step)
+            )
+            continue
+        if size + tokens > max_tokens:
+            close()
+        current.append(line)
+        size += tokens
+    close()
+    return chunks
+
+
+class DocIndex:
+    """
+    An in-memory BM25 index over the fetched documentation.
+
+    The plain text of every page is split into chunks at section and paragraph boundaries, so a
+    question only needs the few chunks related to it, instead of the whole pages.
+
+    With a `DigestStore`, a compact digest of every chunk is prepared in the background, and the
+    search returns the digests instead of the chunks when they still cover the question.
+    """
+
+    def __init__(
+        self,
+        data: RawHTMLData,
+        max_chunk_tokens: int = 256,
+        digests: Optional["DigestStore"] = None,
+    ) -> None:
+        """
+        @param data (RawHTMLData): The output of `PythonFetch.fetch_content`.
+        @param max_chunk_tokens (int): Maximum (estimated) tokens of a chunk.
+        @param digests (Optional[DigestStore]): Where the digests of the chunks are cached. `None`
+        to always return the full chunks.
+        """
+        start: float = time.perf_counter()
+        pages: RawHTMLFileList = data if isinstance(data, list) else [data]
+
+        page_chunks: list[StringList] = [
+            _chunk(text, max_chunk_tokens) for text, _ in pages
+        ]
+        self.__chunks: StringList = [
+            chunk for chunks in page_chunks for chunk in chunks
+        ]
+        """Every chunk, in document order."""
+        self.__digests: list[Optional[str]] = [None] * len(self.__chunks)
+        """The digest of every chunk, once it's ready."""
+        self.text: str = "\n\n".join(text for text, _ in pages)
+        """The whole indexed documentation."""
+        self.digest: str = hashlib.sha256(self.text.encode("utf-8")).hexdigest()
+        """Hash of the indexed documentation."""
+        self.__lengths: list[int] = []
+        """Number of terms of every chunk."""
+        self.__postings: dict[str, list[tuple[int, int]]] = {}
+        """`term -> [(chunk, term frequency), ...]`"""
+        for i, chunk in enumerate(self.__chunks):
+            terms: StringList = _terms(chunk)
+            self.__lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                self.__postings.setdefault(term, []).append((i, tf))
+        self.__avg_length: float = sum(self.__lengths) / max(1, len(self.__lengths))
+
+        self.__build_seconds: float = time.perf_counter() - start
+        self.__query_seconds: float = 0.0
+        logger.info(
+            f"Indexed {len(self.__chunks)} chunks ({len(self.__postings)} terms) "
+            f"in {self.__build_seconds * 1000:.2f}ms."
+        )
+
+        if digests is not None:
+            threading.Thread(
+                target=self.__prepare_digests,
+                args=(digests, pages, page_chunks, max_chunk_tokens),
+                name="DocDigests",
+                daemon=True,
+            ).start()
+
+    def search(
+        self, question: str, top_k: int, token_budget: int, full_text: bool = False
+    ) -> StringList:
+        """
+        Returns the chunks that best match `question`, in document order.
+
+        A chunk is replaced by its digest (if it's ready), unless the digest left out most of the
+        terms of the question the chunk matched.
+
+        @param question (str): The question of the user.
+        @param top_k (int): Maximum number of chunks.
+        @param token_budget (int): Maximum (estimated) tokens of the chunks together.
+        @param full_text (bool): Whether the full chunks are always returned.
+        @return StringList: The selected chunks. If nothing matches, the first chunks of the
+        documentation that fit the budget.
+        """
+        start: float = time.perf_counter()
+        scores: dict[int, float] = {}
+        n: int = len(self.__chunks)
+        query: set[str] = set(_terms(question))
+        for term in query:
+            postings: list[tuple[int, int]] = self.__postings.get(term, [])
+            if not postings:
+                continue
+            idf: float = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for i, tf in postings:
+                norm: float = 1 - _B + _B * self.__lengths[i] / self.__avg_length
+                scores[i] = scores.get(i, 0.0) + idf * tf * (_K1 + 1) / (
+                    tf + _K1 * norm
+                )
+
+        ranked: list[int] = sorted(scores, key=lambda i: scores[i], reverse=True)
+        if not ranked:
+            ranked = list(range(n))
+
+        selected: dict[int, str] = {}
+        used: int = 0
+        digested: int = 0
+        for i in ranked:
+            if len(selected) >= top_k:
+                break
+            text: str = self.__chunks[i] if full_text else self.__text(i, query)
+            tokens: int = estimate_tokens(text)
+            if used + tokens > token_budget:
+                continue
+            selected[i] = text
+            used += tokens
+            digested += text is not self.__chunks[i]
+
+        self.__query_seconds = time.perf_counter() - start
+        logger.info(
+            f"Selected {len(selected)}/{n} chunks ({digested} digests, ~{used} tokens) "
+            f"in {self.__query_seconds * 1000:.2f}ms."
+        )
+        return [selected[i] for i in sorted(selected)]
+
+    def stats(self) -> dict[str, float]:
+        """
+        - "chunks": Indexed chunks.
+        - "digests": Chunks whose digest is ready.
+        - "terms": Unique terms.
+        - "build_ms": Time it took to build the index.
+        - "query_ms": Time the last search took.
+        """
+        return {
+            "chunks": len(self.__chunks),
+            "digests": sum(d is not None for d in self.__digests),
+            "terms": len(self.__postings),
+            "build_ms": self.__build_seconds * 1000,
+            "query_ms": self.__query_seconds * 1000,
+        }
+
+    def __text(self, i: int, query: set[str]) -> str:
+        """The digest of the chunk `i` if it covers `query` enough, the chunk otherwise."""
+        digest: Optional[str] = self.__digests[i]
+        if digest is None:
+            return self.__chunks[i]
+        matched: set[str] = query.intersection(_terms(self.__chunks[i]))
+        if len(matched.intersection(_terms(digest))) * 2 < len(matched):
+            return self.__chunks[i]
+        return digest
+
+    def __prepare_digests(
+        self,
+        store: "DigestStore",
+        pages: RawHTMLFileList,
+        page_chunks: list[StringList],
+        max_chunk_tokens: int,
+    ) -> None:
+        start: float = time.perf_counter()
+        offset: int = 0
+        for (text, _), chunks in zip(pages, page_chunks):
+            for j, digest in enumerate(store.digests(text, chunks, max_chunk_tokens)):
+                self.__digests[offset + j] = digest
+            offset += len(chunks)
+        full: int = sum(estimate_tokens(c) for c in self.__chunks)
+        digests: int = sum(estimate_tokens(d or "") for d in self.__digests)
+        logger.info(
+            f"Digests of {len(self.__chunks)} chunks ready in "
+            f"{(time.perf_counter() - start) * 1000:.2f}ms: ~{digests}/{full} tokens "
+            f"({store.stats()})."
+        )
@@ -0,0 +1,147 @@
+import re
+import threading
+
+from src.env import *
+
+from .retrieval import estimate_tokens
+
+_COMPLEX = re.compile(
+    r"\b(why|explain|compare|difference|design|architecture|optimi[sz]e|performance|debug|"
+    r"refactor|implement|algorithm|complexity|trade-?offs?|prove|step by step|best practices?)\b",
+    re.IGNORECASE,
+)
+"""Words of questions that need reasoning, not only a lookup."""
+_CODE = re.compile(r"```|^\s{4}\S|\b(def|class|import|lambda|return)\b", re.MULTILINE)
+_UNSURE = re.compile(
+    r"\b(i'?m not sure|i don'?t know|i can(?:no|')t (?:answer|help|determine)|"
+    r"not enough information|unable to (?:answer|determine))\b",
+    re.IGNORECASE,
+)
+"""Answers where the model admits it can't answer."""
+_LONG_QUESTION: int = 60
+"""(Estimated) tokens of a long question; four times as many count twice."""
+_LARGE_CONTEXT: float = 0.75
+"""Share of the context budget (flag 'contextTokens') filled by a large documentation context."""
+_STOP: tuple[object, ...] = (None, 0, 1, "STOP")
+"""Finish reasons of complete answers (unspecified, or stop)."""
+
+
+def _empty_stats() -> dict[str, float]:
+    return {"routed": 0, "escalated": 0, "failed": 0, "answers": 0, "total_ms": 0.0}
+
+
+def complexity(question: str, context: Optional[str], media: MediaList) -> StringList:
+    """
+    The reasons why a request is complex: the more, the more capable the model it needs.
+
+    @param question (str): The question of the user.
+    @param context (Optional[str]): The documentation sent with the question, or the documentation
+    of the session.
+    @param media (MediaList): The images sent with the question.
+    """
+    reasons: StringList = []
+    tokens: int = estimate_tokens(question)
+    if tokens > _LONG_QUESTION:
+        reasons.append(f"long question (~{tokens} tokens)")
+    if tokens > _LONG_QUESTION * 4:
+        reasons.append("very long question")
+    context_tokens: int = estimate_tokens(context) if context else 0
+    if context_tokens > flags.contextTokens * _LARGE_CONTEXT:
+        reasons.append(f"large context (~{context_tokens} tokens)")
+    if media:
+        reasons.append("image")
+    if _CODE.search(question):
+        reasons.append("code")
+    words: set[str] = {w.lower() for w in _COMPLEX.findall(question)}
+    if words:
+        reasons.append(f"reasoning ({', '.join(sorted(words))})")
+    if len(words) >= 3:
+        reasons.append("several reasoning words")
+    return reasons
+
+
+def low_confidence(data: GenericKeyMap) -> Optional[str]:
+    """Why the answer `data` (`GenerateContentResponse.to_dict`) can't be trusted, if it can't."""
+    candidates: list[GenericKeyMap] = data.get("candidates") or []
+    if not candidates:
+        return "no answer"
+    finish: object = candidates[0].get("finish_reason")
+    if finish not in _STOP:
+        return f"finish reason {finish}"
+    text: str = "".join(
+        part.get("text", "") for part in candidates[0]["content"]["parts"]
+    )
+    if not text.strip():
+        return "empty answer"
+    if _UNSURE.search(text):
+        return "the model isn't sure"
+    return None
+
+
+class ModelRouter:
+    """
+    Picks the cheapest adequate model for every request, from a list of models sorted by
+    capability (and cost). A simple request goes to the first one; every reason of `complexity`
+    moves it one model up, at most to the last. See `GeminiModel` for the escalation.
+
+    The decisions and the latency of every model are logged, and kept in `stats`, so the
+    thresholds can be tuned.
+    """
+
+    def __init__(self, models: StringList) -> None:
+        """@param models (StringList): The technical names of the models, cheapest first."""
+        self.models: StringList = models
+        self.__lock = threading.Lock()
+        self.__stats: dict[str, dict[str, float]] = {m: _empty_stats() for m in models}
+
+    def route(
+        self, question: str, context: Optional[str], media: MediaList
+    ) -> StringList:
+        """
+        @return StringList: The models to try, in order: the chosen one, then the more capable ones
+        it escalates to.
+        """
+        reasons: StringList = complexity(question, context, media)
+        level: int = min(len(reasons), len(self.models) - 1)
+        with self.__lock:
+            self.__stats[self.models[level]]["routed"] += 1
+        logger.info(
+            f"Routed to {self.models[level]}: {', '.join(reasons) or 'simple request'}."
+        )
+        return self.models[level:]
+
+    def escalate(self, model: str, reason: str) -> None:
+        """Logs that the answer of `model` was not good enough (`reason`)."""
+        with self.__lock:
+            self.__stats.setdefault(model, _empty_stats())["escalated"] += 1
+        logger.info(f"Escalating from {model}: {reason}.")
+
+    def record(self, model: str, latency_ms: Optional[float]) -> None:
+        """Records an answer of `model`, or a failure if `latency_ms` is `None`."""
+        with self.__lock:
+            stats: dict[str, float] = self.__stats.setdefault(model, _empty_stats())
+            if latency_ms is None:
+                stats["failed"] += 1
+                return
+            stats["answers"] += 1
+            stats["total_ms"] += latency_ms
+            average: float = stats["total_ms"] / stats["answers"]
+        logger.debug(f"{model}: {latency_ms:.0f}ms (average {average:.0f}ms).")
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """
+        For every model:
+        - "routed": Requests routed to it first.
+        - "escalated": Answers it gave that were not good enough.
+        - "failed": Requests it failed to answer.
+        - "answers": Answers it gave.
+        - "avg_ms": Average latency of its answers.
+        """
+        with self.__lock:
+            return {
+                model: {
+                    **{k: v for k, v in stats.items() if k != "total_ms"},
+                    "avg_ms": stats["total_ms"] / max(1, stats["answers"]),
+                }
+                for model, stats in self.__stats.items()
+            }
@@ -0,0 +1,194 @@
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from src.env import *
+
+
+class TokenBucket:
+    """
+    Allows `per_minute` units (requests or tokens) per minute. Up to a minute of units can be
+    spent at once; they are refilled continuously.
+    """
+
+    def __init__(self, per_minute: int) -> None:
+        """@param per_minute (int): Units allowed per minute, `0` for no limit."""
+        self.__capacity: float = float(per_minute)
+        self.__rate: float = per_minute / 60
+        self.__tokens: float = self.__capacity
+        self.__updated: float = time.monotonic()
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available, `0.0` if they already are."""
+        if not self.__capacity:
+            return 0.0
+        self.__refill()
+        # A single request bigger than the bucket would never fit, it waits for a full bucket.
+        missing: float = min(amount, self.__capacity) - self.__tokens
+        return max(0.0, missing / self.__rate)
+
+    def take(self, amount: float) -> None:
+        """Spends `amount` units. The bucket can be overdrawn (e.g. by the tokens of an answer)."""
+        if not self.__capacity:
+            return
+        self.__refill()
+        self.__tokens -= amount
+
+    def drain(self) -> None:
+        """Empties the bucket, e.g. after the API reported the quota as exhausted."""
+        self.__refill()
+        self.__tokens = min(self.__tokens, 0.0)
+
+    def __refill(self) -> None:
+        now: float = time.monotonic()
+        self.__tokens = min(
+            self.__capacity, self.__tokens + (now - self.__updated) * self.__rate
+        )
+        self.__updated = now
+
+
+class RequestScheduler:
+    """
+    Admission control of the requests sent to the models.
+
+    - Every user has its own queue, and the queues are served in turn (round-robin), so a burst of
+      questions from one user doesn't delay the questions of the others.
+    - At most `max_concurrency` requests run at the same time.
+    - Every model has a requests-per-minute and a tokens-per-minute bucket; a request waits until
+      both allow it, instead of failing on the API quota.
+    """
+
+    def __init__(
+        self, max_concurrency: int, quotas: Callable[[str], tuple[int, int]]
+    ) -> None:
+        """
+        @param max_concurrency (int): Maximum number of requests running at the same time.
+        @param quotas (Callable[[str], tuple[int, int]]): Returns the requests and the tokens per
+        minute allowed for a model name (`0` for no limit).
+        """
+        self.__max_concurrency: int = max_concurrency
+        self.__quotas: Callable[[str], tuple[int, int]] = quotas
+        self.__condition = threading.Condition()
+        self.__queues: dict[str, deque[tuple[str, int]]] = {}
+        """`user -> [(model, tokens), ...]` of the waiting requests, oldest first."""
+        self.__turns: deque[str] = deque()
+        """The users with waiting requests, the next one to be served first."""
+        self.__buckets: dict[str, tuple[TokenBucket, TokenBucket]] = {}
+        """`model -> (requests bucket, tokens bucket)`"""
+        self.__running: int = 0
+        self.__admitted: int = 0
+        self.__waited: float = 0.0
+        self.__max_wait: float = 0.0
+
+    @contextmanager
+    def slot(self, user: str, model: str, tokens: int) -> Iterator[float]:
+        """
+        Waits for the turn of a request, and holds its slot until the block exits.
+
+        @param user (str): Identifies the user who sent the request.
+        @param model (str): The name of the model the request is sent to.
+        @param tokens (int): The (estimated) tokens of the prompt.
+        @return Iterator[float]: Yields the seconds the request waited.
+        """
+        waited: float = self.__acquire(user, model, tokens)
+        try:
+            yield waited
+        finally:
+            with self.__condition:
+                self.__running -= 1
+                self.__condition.notify_all()
+
+    def charge(self, model: str, tokens: int) -> None:
+        """Spends `tokens` more of the tokens per minute of `model`, e.g. the answer tokens."""
+        with self.__condition:
+            self.__bucket(model)[1].take(tokens)
+
+    def exhausted(self, model: str) -> None:
+        """The API refused a request of `model` (quota exceeded): the next ones wait for a refill."""
+        with self.__condition:
+            for bucket in self.__bucket(model):
+                bucket.drain()
+        logger.warning(f"Quota of '{model}' exceeded, requests are slowed down.")
+
+    def stats(self) -> dict[str, float]:
+        """
+        - "queued": Requests waiting for their turn.
+        - "users": Users with waiting requests.
+        - "running": Requests running.
+        - "admitted": Requests admitted so far.
+        - "wait_avg_ms": Average wait of the admitted requests.
+        - "wait_max_ms": Longest wait of an admitted request.
+        """
+        with self.__condition:
+            return {
+                "queued": sum(len(q) for q in self.__queues.values()),
+                "users": len(self.__turns),
+                "running": self.__running,
+                "admitted": self.__admitted,
+                "wait_avg_ms": self.__waited / max(1, self.__admitted) * 1000,
+                "wait_max_ms": self.__max_wait * 1000,
+            }
+
+    def __acquire(self, user: str, model: str, tokens: int) -> float:
+        start: float = time.monotonic()
+        request: tuple[str, int] = (model, tokens)
+        with self.__condition:
+            if user not in self.__queues:
+                self.__queues[user] = deque()
+                self.__turns.append(user)
+            self.__queues[user].append(request)
+
+            while True:
+                timeout: Optional[float] = None
+                if self.__running < self.__max_concurrency:
+                    # Every waiting request was woken up, the chosen one admits itself.
+                    chosen, timeout = self.__next()
+                    if chosen == user and self.__queues[user][0] is request:
+                        break
+                self.__condition.wait(timeout)
+
+            self.__queues[user].popleft()
+            self.__turns.remove(user)
+            if self.__queues[user]:
+                self.__turns.append(user)
+            else:
+                del self.__queues[user]
+            requests, token_bucket = self.__bucket(model)
+            requests.take(1)
+            token_bucket.take(tokens)
+            self.__running += 1
+
+            waited: float = time.monotonic() - start
+            self.__admitted += 1
+            self.__waited += waited
+            self.__max_wait = max(self.__max_wait, waited)
+            self.__condition.notify_all()
+
+        if waited >= 0.1:
+            logger.info(
+                f"'{model}' request of '{user}' waited {waited * 1000:.0f}ms: {self.stats()}"
+            )
+        return waited
+
+    def __next(self) -> tuple[Optional[str], Optional[float]]:
+        """
+        The first user (in turn) whose oldest request the buckets allow, or the seconds until one
+        of them is allowed.
+        """
+        soonest: Optional[float] = None
+        for user in self.__turns:
+            model, tokens = self.__queues[user][0]
+            requests, token_bucket = self.__bucket(model)
+            wait: float = max(requests.wait_time(1), token_bucket.wait_time(tokens))
+            if not wait:
+                return user, None
+            soonest = wait if soonest is None else min(soonest, wait)
+        return None, soonest
+
+    def __bucket(self, model: str) -> tuple[TokenBucket, TokenBucket]:
+        if model not in self.__buckets:
+            rpm, tpm = self.__quotas(model)
+            self.__buckets[model] = (TokenBucket(rpm), TokenBucket(tpm))
+        return self.__buckets[model]
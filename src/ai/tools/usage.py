@@ -0,0 +1,152 @@
+import json
+import math
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from .atomic import write_atomic
+from src.env import *
+
+_FIELDS: StringList = [
+    "prompt_tokens",
+    "completion_tokens",
+    "cached_tokens",
+    "payload_bytes",
+    "latency_ms",
+]
+"""The measures of a request, summed and summarized by `UsageLedger`."""
+
+
+def _percentile(values: list[float], p: float) -> float:
+    """The `p`th percentile (nearest rank) of `values`, `0.0` if there are none."""
+    if not values:
+        return 0.0
+    ordered: list[float] = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+class UsageLedger:
+    """
+    Accounting of every request sent to the models: tokens (from the `usage_metadata` of the
+    answers), payload size and latency. Records are aggregated per session and per model.
+
+    The latest `max_records` records are kept, for the percentiles; the totals count every request.
+    """
+
+    def __init__(self, max_records: int = 10_000) -> None:
+        self.__lock = threading.Lock()
+        self.__records: deque[GenericKeyMap] = deque(maxlen=max_records)
+        self.__totals: dict[tuple[str, str], dict[str, float]] = {}
+        """`(session, model) -> {"requests", "failed", *_FIELDS}`"""
+
+    def record(
+        self,
+        session: str,
+        model: str,
+        usage: Optional[GenericKeyMap],
+        payload_bytes: int,
+        latency_ms: float,
+        estimated: tuple[int, int] = (0, 0),
+    ) -> GenericKeyMap:
+        """
+        Records a request, and returns its record.
+
+        @param session (str): Identifies the user (session) of the request.
+        @param model (str): The model the request was sent to.
+        @param usage (Optional[GenericKeyMap]): The `usage_metadata` of the answer, `None` if the
+        request failed.
+        @param payload_bytes (int): Size of the request.
+        @param latency_ms (float): Time the request took.
+        @param estimated (tuple[int, int]): Prompt and completion tokens estimated locally, used
+        when the answer has no `usage_metadata`.
+        """
+        record: GenericKeyMap = {
+            "time": time.time(),
+            "session": session,
+            "model": model,
+            "failed": usage is None,
+            "estimated": not usage,
+            "prompt_tokens": (usage or {}).get("prompt_token_count", estimated[0]),
+            "completion_tokens": (usage or {}).get(
+                "candidates_token_count", estimated[1] if usage is not None else 0
+            ),
+            "cached_tokens": (usage or {}).get("cached_content_token_count", 0),
+            "payload_bytes": payload_bytes,
+            "latency_ms": latency_ms,
+        }
+        with self.__lock:
+            self.__records.append(record)
+            totals: dict[str, float] = self.__totals.setdefault(
+                (session, model), dict.fromkeys(["requests", "failed", *_FIELDS], 0)
+            )
+            totals["requests"] += 1
+            totals["failed"] += record["failed"]
+            for field in _FIELDS:
+                totals[field] += record[field]
+        logger.debug(
+            f"Usage of {model}: {record['prompt_tokens']} prompt, "
+            f"{record['completion_tokens']} completion, {record['cached_tokens']} cached tokens, "
+            f"{payload_bytes} bytes, {latency_ms:.0f}ms."
+        )
+        return record
+
+    def summary(self, session: Optional[str] = None) -> GenericKeyMap:
+        """
+        @param session (Optional[str]): Only summarizes this session. `None` for every session.
+        @return GenericKeyMap: `{"total": ..., "models": {model: ...}, "sessions": {session: ...}}`,
+        with the totals of `_FIELDS`, the number of (failed) requests, and the p50/p95 of the
+        prompt tokens, the payload and the latency.
+        """
+        with self.__lock:
+            totals: dict[tuple[str, str], dict[str, float]] = {
+                key: dict(value)
+                for key, value in self.__totals.items()
+                if session is None or key[0] == session
+            }
+            records: list[GenericKeyMap] = [
+                r for r in self.__records if session is None or r["session"] == session
+            ]
+
+        def aggregate(keep: Callable[[str, str], bool]) -> GenericKeyMap:
+            result: GenericKeyMap = dict.fromkeys(["requests", "failed", *_FIELDS], 0)
+            for (s, m), values in totals.items():
+                if keep(s, m):
+                    for field, value in values.items():
+                        result[field] += value
+            selected: list[GenericKeyMap] = [
+                r for r in records if keep(r["session"], r["model"]) and not r["failed"]
+            ]
+            for field in ["prompt_tokens", "payload_bytes", "latency_ms"]:
+                values: list[float] = [r[field] for r in selected]
+                result[f"{field}_p50"] = _percentile(values, 50)
+                result[f"{field}_p95"] = _percentile(values, 95)
+            return result
+
+        return {
+            "total": aggregate(lambda s, m: True),
+            "models": {
+                model: aggregate(lambda s, m, model=model: m == model)
+                for model in sorted({m for _, m in totals})
+            },
+            "sessions": {
+                name: aggregate(lambda s, m, name=name: s == name)
+                for name in sorted({s for s, _ in totals})
+            },
+        }
+
+    def export(self, path: str | Path) -> Path:
+        """Writes the summary and the kept records to the JSON file `path`, and returns it."""
+        path = Path(path)
+        with self.__lock:
+            records: list[GenericKeyMap] = list(self.__records)
+        content: str = json.dumps(
+            {"summary": self.summary(), "records": records}, indent=2
+        )
+        write_atomic(path, content)
+        logger.info(f"Usage of {len(records)} requests exported to '{path}'.")
+        return path
+
+
+usage = UsageLedger()
+"""Tokens, payload and latency of every request, per session and per model."""
@@ -0,0 +1,199 @@
+import codecs
+import json
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from requests import Session
+from requests.exceptions import RequestException
+from tenacity import retry, stop_after_attempt, wait_fixed
+
+from .atomic import write_atomic
+from src.env import *
+
+PYTHON_API: LitStr = "https://www.python.org/api/v2/downloads/release/"
+"""Every Python release, as a (large) JSON array."""
+_RETRY_AFTER: int = 300
+"""Seconds before a failed refresh is attempted again."""
+
+
+def _iter_json_array(chunks: Iterable[bytes]) -> Iterator[GenericKeyMap]:
+    """
+    Yields the elements of a top-level JSON array while it's being downloaded.
+    Only the element currently being parsed is kept in memory, never the whole document.
+
+    @param chunks (Iterable[bytes]): Raw UTF-8 chunks of the JSON document.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer: str = ""
+    started: bool = False
+
+    for chunk in chunks:
+        buffer += utf8.decode(chunk)
+        pos: int = 0
+        while True:
+            # Skip the separators between elements.
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buffer):
+                break
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("The JSON document is not an array.")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The element is incomplete, wait for the next chunk.
+                break
+            yield item
+        buffer = buffer[pos:]
+
+
+class PythonVersionCatalogue:
+    """
+    The list of every released Python version (major.minor).
+
+    The last known list is persisted in the cache folder, so it's available immediately at startup.
+    Once it's older than its TTL, it's refreshed from the Python API in a background thread.
+    """
+
+    def __init__(self, session: Session, path: str | Path, ttl: int) -> None:
+        """
+        @param session (Session): The (shared) session used to reach the Python API.
+        @param path (str | Path): JSON file where the list is persisted.
+        @param ttl (int): Age (seconds) after which the persisted list is refreshed.
+        """
+        self.__session: Session = session
+        self.__path: Path = Path(path)
+        self.__ttl: int = ttl
+        self.__lock = threading.Lock()
+        self.__versions: StringList = []
+        """Last known list of versions."""
+        self.__fetched_at: float = 0.0
+        """When `__versions` was downloaded (epoch)."""
+        self.__refresh: Optional[threading.Thread] = None
+        """The running background refresh, if any."""
+        self.__failed_at: float = 0.0
+        """When the last refresh failed (epoch), see `_RETRY_AFTER`."""
+        self.__waited: bool = False
+        """Whether a read already waited for a refresh. Reads only wait once per process."""
+
+        self.__load()
+
+    @property
+    def versions(self) -> StringList:
+        """
+        Returns the last known list of versions, starting a background refresh if it's stale.
+        Only when nothing was ever persisted (first run) this waits for the refresh, at most
+        `connectTimeout` seconds, and only once per process: later reads return immediately.
+        """
+        refresh: Optional[threading.Thread] = self.refresh_in_background()
+        with self.__lock:
+            wait: bool = not self.__versions and not self.__waited
+            self.__waited = self.__waited or wait
+        if wait and refresh is not None:
+            logger.warning("No Python versions are known yet, waiting for python.org.")
+            refresh.join(timeout=flags.connectTimeout)
+
+        with self.__lock:
+            return list(self.__versions)
+
+    def refresh_in_background(self) -> Optional[threading.Thread]:
+        """
+        Starts refreshing the list in a daemon thread if it's stale and no refresh is running.
+        A failed refresh is only attempted again after `_RETRY_AFTER` seconds.
+        Returns the running refresh thread, or `None` if the list is fresh, or can't be refreshed
+        (flag 'deadInternet' is set, or the last refresh failed recently).
+        """
+        if flags.deadInternet:
+            return None
+        with self.__lock:
+            now: float = time.time()
+            if now - self.__fetched_at <= self.__ttl:
+                return None
+            if now - self.__failed_at <= _RETRY_AFTER:
+                return None
+            if self.__refresh is None or not self.__refresh.is_alive():
+                self.__refresh = threading.Thread(
+                    target=self.__update, name="PythonVersionCatalogue", daemon=True
+                )
+                self.__refresh.start()
+            return self.__refresh
+
+    def __load(self) -> None:
+        """Loads the persisted list, if any."""
+        try:
+            data: GenericKeyMap = json.loads(self.__path.read_text(encoding="utf-8"))
+            self.__versions = list(data["versions"])
+            self.__fetched_at = float(data["fetched_at"])
+            logger.debug(f"Loaded {len(self.__versions)} Python versions from cache.")
+        except (OSError, ValueError, KeyError, TypeError):
+            logger.info("There is no persisted list of Python versions.")
+
+    def __update(self) -> None:
+        """Downloads and persists a new list. On failure the last known list is kept."""
+        friendly.i_was_called(self.__update)
+        try:
+            versions: StringList = self.__download()
+        except (RequestException, ValueError) as e:
+            logger.error(f"Could not refresh the Python versions: {e}")
+            self.__failed()
+            return
+        except Exception as e:  # `RetryError` once every attempt failed.
+            logger.error(f"Could not reach '{PYTHON_API}': {e}")
+            self.__failed()
+            return
+
+        fetched_at: float = time.time()
+        with self.__lock:
+            self.__versions = versions
+            self.__fetched_at = fetched_at
+
+        write_atomic(
+            self.__path, json.dumps({"fetched_at": fetched_at, "versions": versions})
+        )
+        logger.info("Python versions loaded successfully.")
+
+    def __failed(self) -> None:
+        with self.__lock:
+            self.__failed_at = time.time()
+
+    @retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
+    def __download(self) -> StringList:
+        """
+        Fetch and extract available Python versions from the Python API.
+        The release JSON is parsed as a stream, one release at a time.
+
+        @return StringList: A sorted list of available Python versions (major.minor).
+
+        Raises:
+            `ValueError`: If an invalid version string is encountered.
+            `RequestException`: If the request to the Python API fails.
+        """
+        versions: set[str] = set()
+
+        with self.__session.get(
+            PYTHON_API, timeout=flags.connectTimeout, stream=True
+        ) as response:
+            response.raise_for_status()
+            for r in _iter_json_array(response.iter_content(chunk_size=1 << 16)):
+                if r["name"].startswith("Python 3.") and not r["pre_release"]:
+                    # Find the first occurrence of "3."
+                    start: int = r["name"].find("3.")
+                    if start == -1:
+                        raise ValueError(f"Invalid version string for: {r['name']}.")
+
+                    # Extract the substring starting from "3."
+                    ver_substr: str = r["name"][start:]
+
+                    # Split the substring by '.' and take the first two parts
+                    major_minor: str = ".".join(ver_substr.split(".")[:2])
+                    versions.add(major_minor)
+
+        return sorted(versions)
@@ -52,6 +52,47 @@ class __ArgsHandler:
         self.loggerName: str = self.__a.loggerName
         # UI Configuration Flags
         self.noLoggerInUI: bool = self.__a.noLoggerInUI
+        # Fetcher Configuration Flags
+        self.httpCacheTTL: int = self.__a.httpCacheTTL
+        self.httpPoolSize: int = self.__a.httpPoolSize
+        self.fetchWorkers: int = self.__a.fetchWorkers
+        self.pyVersionsTTL: int = self.__a.pyVersionsTTL
+        self.docBundle: str = self.__a.docBundle
+        self.buildDocBundle: StringList = self.__a.buildDocBundle
+        self.processedCacheMB: int = self.__a.processedCacheMB
+        self.compressCache: bool = self.__a.compressCache
+        self.crawl: StringList = self.__a.crawl
+        self.crawlDepth: int = self.__a.crawlDepth
+        self.crawlMaxPages: int = self.__a.crawlMaxPages
+        self.crawlHostConcurrency: int = self.__a.crawlHostConcurrency
+        self.breakerThreshold: int = self.__a.breakerThreshold
+        self.breakerCooldown: int = self.__a.breakerCooldown
+        # AI Configuration Flags
+        self.contextTokens: int = self.__a.contextTokens
+        self.retrievalTopK: int = self.__a.retrievalTopK
+        self.noAnswerCache: bool = self.__a.noAnswerCache
+        self.answerCacheTTL: int = self.__a.answerCacheTTL
+        self.answerCacheSize: int = self.__a.answerCacheSize
+        self.noStreaming: bool = self.__a.noStreaming
+        self.historyTokens: int = self.__a.historyTokens
+        self.noHistorySummary: bool = self.__a.noHistorySummary
+        self.sessionContext: bool = self.__a.sessionContext
+        self.fakeAI: bool = self.__a.fakeAI
+        self.transcript: bool = self.__a.transcript
+        self.aiWorkers: int = self.__a.aiWorkers
+        self.fakeLatency: float = self.__a.fakeLatency
+        self.fakeJitter: float = self.__a.fakeJitter
+        self.fakeChunkDelay: float = self.__a.fakeChunkDelay
+        self.fakeErrorRate: float = self.__a.fakeErrorRate
+        self.fakeResponse: str = self.__a.fakeResponse
+        self.fakeSeed: int = self.__a.fakeSeed
+        self.aiRPM: int = self.__a.aiRPM
+        self.aiTPM: int = self.__a.aiTPM
+        self.aiFreeTier: bool = self.__a.aiFreeTier
+        self.imageMaxSide: int = self.__a.imageMaxSide
+        self.imageFormat: str = self.__a.imageFormat
+        self.imageQuality: int = self.__a.imageQuality
+        self.noDigests: bool = self.__a.noDigests
 
         class __Helper:
             is_extraSecrets_set: bool = not (
@@ -127,6 +168,49 @@ class __ArgsHandler:
         set_arg("-loggerName", type=str, default=_logger_name)
         # UI Configuration Flags
         set_arg("-noLoggerInUI", action="store_false", default=True)
+        # Fetcher Configuration Flags
+        set_arg("-httpCacheTTL", type=int, default=86400)
+        set_arg("-httpPoolSize", type=int, default=10)
+        set_arg("-fetchWorkers", type=int, default=4)
+        set_arg("-pyVersionsTTL", type=int, default=604800)
+        set_arg("-docBundle", type=str, default="")
+        set_arg("-buildDocBundle", type=str, nargs="+", default=[])
+        set_arg("-processedCacheMB", type=int, default=64)
+        set_arg("-compressCache", action="store_true", default=False)
+        set_arg("-crawl", type=str, nargs="+", default=[])
+        set_arg("-crawlDepth", type=int, default=3)
+        set_arg("-crawlMaxPages", type=int, default=500)
+        set_arg("-crawlHostConcurrency", type=int, default=4)
+        set_arg("-breakerThreshold", type=int, default=3)
+        set_arg("-breakerCooldown", type=int, default=30)
+        # AI Configuration Flags
+        set_arg("-contextTokens", type=int, default=2000)
+        set_arg("-retrievalTopK", type=int, default=8)
+        set_arg("-noAnswerCache", action="store_true", default=False)
+        set_arg("-answerCacheTTL", type=int, default=604800)
+        set_arg("-answerCacheSize", type=int, default=512)
+        set_arg("-noStreaming", action="store_true", default=False)
+        set_arg("-historyTokens", type=int, default=8000)
+        set_arg("-noHistorySummary", action="store_true", default=False)
+        set_arg("-sessionContext", action="store_true", default=False)
+        set_arg("-fakeAI", action="store_true", default=False)
+        set_arg("-transcript", action="store_true", default=False)
+        set_arg("-aiWorkers", type=int, default=4)
+        set_arg("-fakeLatency", type=float, default=0.0)
+        set_arg("-fakeJitter", type=float, default=0.0)
+        set_arg("-fakeChunkDelay", type=float, default=0.0)
+        set_arg("-fakeErrorRate", type=float, default=0.0)
+        set_arg("-fakeResponse", type=str, default="")
+        set_arg("-fakeSeed", type=int, default=0)
+        set_arg("-aiRPM", type=int, default=0)
+        set_arg("-aiTPM", type=int, default=0)
+        set_arg("-aiFreeTier", action="store_true", default=False)
+        set_arg("-imageMaxSide", type=int, default=1024)
+        set_arg(
+            "-imageFormat", type=str, choices=["WEBP", "JPEG", "PNG"], default="WEBP"
+        )
+        set_arg("-imageQuality", type=int, default=80)
+        set_arg("-noDigests", action="store_true", default=False)
 
         return parser.parse_args()
 
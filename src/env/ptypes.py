@@ -70,5 +70,12 @@ FlexibleString = str | list[str]
 FlexibleStringMap = dict[str, FlexibleString]
 FlexibleStringData = Optional[FlexibleString]
 RawHTMLFile = tuple[str, Path]
+"""
+Plain text of a page, and where it's kept: the manifest of the page in the processed store
+(`processed/manifests/<key>.json`), or the documentation bundle it was served from.
+"""
 RawHTMLFileList = list[RawHTMLFile]
 RawHTMLData = RawHTMLFileList | RawHTMLFile
+RawHTMLFileMap = dict[str, RawHTMLFile]
+ExtractedHTML = tuple[str, str, str]
+"""Title, cleaned HTML and plain text of a page."""
@@ -1,6 +1,8 @@
+from pathlib import Path
 from flet import Page, ListView, Text
 from icecream import ic
 
+from src.ai.tools.usage import usage
 from src.env import *
 from .function_wrapper import f_wrapper
 
@@ -16,6 +18,8 @@ class CommandsHandler:
             "exit": lambda: EnvStates.exit_on_command,
             "clear": lambda: self.__clear,
             "logchat": lambda: self.__logchat,
+            "usage": lambda: self.__usage,
+            "exportusage": lambda: self.__export_usage,
         }
 
         logger.info(f"Setting up '{friendly.full_name(CommandsHandler)}'")
@@ -66,3 +70,28 @@ class CommandsHandler:
             # else, do nothing and continue.
         logger.debug(_)
         logger.warning("Cleared messages won't be logged.")
+
+    def __usage(self) -> None:
+        """Shows the usage of the AI in this session, and of every model in every session."""
+        summary: GenericKeyMap = usage.summary()
+        session: Optional[GenericKeyMap] = summary["sessions"].get(self.page.session_id)
+        lines: StringList = [
+            "AI usage of this session: "
+            + (self.__usage_line(session) if session else "no requests yet.")
+        ]
+        for model, values in summary["models"].items():
+            lines.append(f"- {model}: {self.__usage_line(values)}")
+        self.__new_message_alert("\n".join(lines))
+
+    def __usage_line(self, values: GenericKeyMap) -> str:
+        return (
+            f"{values['requests']} requests ({values['failed']} failed), "
+            f"{values['prompt_tokens']} prompt + {values['completion_tokens']} completion tokens "
+            f"({values['cached_tokens']} cached), {values['payload_bytes'] / 1024:.1f} KiB sent, "
+            f"p95 prompt ~{values['prompt_tokens_p95']} tokens, "
+            f"p95 latency {values['latency_ms_p95']:.0f}ms."
+        )
+
+    def __export_usage(self) -> None:
+        path: Path = usage.export(Path(CACHE_FOLDER) / "usage.json")
+        self.__new_message_alert(f"AI usage exported to '{path}'.")
@@ -1,4 +1,4 @@
-import json
+import time
 from icecream import ic
 import flet as ft
 
@@ -10,6 +10,16 @@ from .dropdown_menus import DropdownMenuTypes
 from .message import Message, MessageType
 from .helper import int_helper
 
+_STREAM_UPDATE_INTERVAL: float = 0.1
+"""Minimum seconds between two page updates while an answer is streamed."""
+_PREVIEW_LENGTH: int = 40
+
+
+def _preview(text: str) -> str:
+    """The beginning of `text`, on a single line."""
+    text = " ".join(text.split())
+    return text if len(text) <= _PREVIEW_LENGTH else f"{text[:_PREVIEW_LENGTH]}..."
+
 
 class Interface:
     def __init__(self, page: ft.Page) -> None:
@@ -78,6 +88,8 @@ class Interface:
         Use the name of the variable as a string key.
         """
         self.__raw_html_data: Optional[RawHTMLData] = None
+        self.__doc_index: Optional[DocIndex] = None
+        """Index of the fetched documentation, only the relevant chunks are sent to the AI."""
         self.__gemini = GeminiModel(do_raise=False)
         self.__is_after_fetch: bool = False
 
@@ -193,7 +205,8 @@ class Interface:
             # In case the message wasn't a command, simply prompt the new message into the chat.
             self.__send_normal_msg(MessageType.USERNAME.value, message_text)
             if self.__is_after_fetch:
-                self.__get_new_message_from_ai(message_text)
+                # Answered in the background, the chat stays responsive in the meantime.
+                self.__page.run_task(self.__get_new_message_from_ai, message_text)
             else:
                 raise ai_exc.AIRequestFailure(
                     "Cannot send a message to the AI before fetching."
@@ -256,26 +269,102 @@ class Interface:
         # Argument `message_text` is not a command, simple as that.
         return False
 
-    def __get_new_message_from_ai(self, user_message: str) -> None:
+    async def __get_new_message_from_ai(self, user_message: str) -> None:
+        """
+        Answers `user_message` in the background. A pending indicator holds its place in the chat
+        until the answer (streamed, unless flag 'noStreaming' is set) replaces it, so several
+        questions can wait at the same time and every answer quotes its question.
+        """
         friendly.i_was_called(self.__get_new_message_from_ai)
 
         if not self.__is_after_fetch:
             raise ai_exc.AIRequestFailure("Failed to get message from AI.")
 
-        if isinstance(self.__raw_html_data, list):
-            raise NotImplementedError()
+        label: str = f'{EnvInfo.ai_name.value} (re: "{_preview(user_message)}")'
+        placeholder = ft.Row(
+            [
+                ft.ProgressRing(width=14, height=14, stroke_width=2),
+                ft.Text(f"{label} is thinking...", italic=True, size=12),
+            ]
+        )
+        self.__chat_ctrls.append(placeholder)
+        self.__page.update()
+
+        # The documentation of the session was already sent to the model. Otherwise, only the chunks
+        # related to the question are sent, within the token budget.
+        context: Optional[str] = None
+        if not flags.sessionContext:
+            chunks: StringList = self.__doc_index.search(  # type: ignore[reportOptionalMemberAccess]
+                user_message, flags.retrievalTopK, flags.contextTokens
+            )
+            context = "\n\n".join(chunks)
+        context_id: str = self.__doc_index.digest  # type: ignore[reportOptionalMemberAccess]
 
-        # The data is a tuple.
         logger.info([user_message, EnvStates.success.value])
-        message: StringList = [
-            f"Following this documentation:{self.__raw_html_data}",
-            f"Answer this:{user_message}",
-        ]
-        ai_response: Path = self.__gemini.get_response(["".join(message)])
-        json_response: GenericKeyMap = json.loads(ai_response.read_text())
-        final_response: str = self.__gemini.get_final_response(json_response)
+        message = ft.Text(f"{label}: ")
+        answer: str = ""
+        try:
+            if flags.noStreaming:
+                ai_response: AIResponse = await self.__gemini.ask_async(
+                    user_message, context, context_id
+                )
+                answer = ai_response.text
+                message.value = f"{label}: {answer}"
+                self.__replace_chat_control(placeholder, message)
+            else:
+                # Page updates are throttled to one every `_STREAM_UPDATE_INTERVAL` seconds.
+                last_update: float = 0.0
+                # Whether the answer took the place of the placeholder.
+                replaced: bool = False
+                async for chunk in self.__gemini.ask_stream_async(
+                    user_message, context, context_id
+                ):
+                    if not replaced:
+                        self.__replace_chat_control(placeholder, message)
+                        replaced = True
+                    answer += chunk
+                    message.value = f"{label}: {answer}"
+                    if time.monotonic() - last_update >= _STREAM_UPDATE_INTERVAL:
+                        self.__page.update()
+                        last_update = time.monotonic()
+                # A stream without any chunk never replaced the placeholder.
+                if not replaced:
+                    self.__replace_chat_control(placeholder, message)
+        except Exception as e:
+            logger.error(f"No answer for '{user_message}': {e}")
+            self.__replace_chat_control(
+                placeholder,
+                ft.Text(
+                    f"{label} failed to answer.",
+                    italic=True,
+                    color=ft.colors.BLACK45,
+                    size=12,
+                ),
+            )
+            self.__page.update()
+            return
+        self.__page.update()
+
+        logger.info(f"{MessageType.CHAT} | {answer}")
+        self.__page.pubsub.send_others(
+            Message(user=label, text=answer, type=MessageType.CHAT)
+        )
+
+    def __replace_chat_control(self, old: ft.Control, new: ft.Control) -> None:
+        """Puts `new` in the place of `old` in the chat."""
+        if old in self.__chat_ctrls:
+            self.__chat_ctrls[self.__chat_ctrls.index(old)] = new
+        else:
+            self.__chat_ctrls.append(new)
 
-        self.__send_normal_msg(EnvInfo.ai_name.value, final_response)
+    def __share_documentation(self) -> None:
+        """
+        Sends the fetched documentation to the model as the context of the session, if flag
+        'sessionContext' is set. The model only rebuilds its context if the documentation changed.
+        """
+        if not flags.sessionContext or self.__doc_index is None:
+            return
+        self.__gemini.set_context(self.__doc_index.text, self.__doc_index.digest)
 
     def __add_new_dropdown_menu(
         self, options: StringList, key_name: DropdownMenuTypes, preview: LitStr
@@ -310,12 +399,20 @@ class Interface:
             final: str = (
                 f"Message {EnvInfo.ai_name.value}{f' - {name}' if name is not None else ''}"
             )
+            # The previous model frees its documentation before it's replaced.
+            self.__gemini.close()
             self.__gemini = GeminiModel(
-                int_helper.get_logical_value(name, GEMINI_MODEL_NAMES)
+                int_helper.get_logical_value(name, GEMINI_MODEL_NAMES),
+                user=self.__page.session_id,
             )
+            self.__share_documentation()
             self.__write_msg_field.label = final
             self.__write_msg_field.update()
 
+        # Warm the caches with the documentation of the selected version.
+        elif key_name == DropdownMenuTypes.PY_VERS:
+            py_fetch.prefetch(int_helper.get_logical_value(value, py_fetch.PY_VERSIONS))
+
         logger.debug(friendly.iter_info(self.__dropdown_menu_holders))
 
     def __check_if_fetching_is_possible(self, e: ft.ControlEvent) -> None:
@@ -346,9 +443,16 @@ class Interface:
 
             ic(aim, ver, doc)
             self.__raw_html_data = py_fetch.fetch_content(doc, ver)
+            self.__doc_index = DocIndex(
+                self.__raw_html_data,
+                digests=None if flags.noDigests else digest_store,
+            )
             self.__is_after_fetch = True
+            self.__share_documentation()
 
+            index_stats: dict[str, float] = self.__doc_index.stats()
             self.__send_alert_msg(
-                txt=f"Selected {aim}, with Python {ver} & {doc.capitalize()}."
+                txt=f"Selected {aim}, with Python {ver} & {doc.capitalize()}. "
+                f"Indexed {index_stats['chunks']} chunks in {index_stats['build_ms']:.1f}ms."
             )
             self.__page.update()